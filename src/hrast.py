@@ -1,10 +1,66 @@
+from collections import Counter
+
+import hrir
+
+SPEED = "speed"
+SIZE = "size"
+# Counted loops with at most this many iterations are unrolled completely, when favoring speed
+MAX_UNROLL = 8
+# Loops with an unknown trip count share one jump back for this many iterations, when favoring speed
+UNROLL_FACTOR = 2
+# Stands for all variables, when a statement writes through a pointer
+ANY_VARIABLE = "*"
+# A use within a loop counts this many times as much as one outside, when the variables are placed on the floor
+LOOP_WEIGHT = 10
+
+
 class BaseObject(object):
+    # Source line of the node, 0 for nodes made up by the compiler
+    line = 0
+
     def has_return_value(self):
         return False
 
     def compile(self, ctx):
         pass
 
+    def changed_variables(self):
+        return set()
+
+    def count_variables(self, uses, fixed, weight=1):
+        # Adds the uses of the variables to the counter uses and the tiles the program places variables on to
+        # fixed, as a set of names per tile
+        pass
+
+    def constant_value(self, ctx):
+        # The value the expression is known to have at compile time, None when it is not known
+        return None
+
+
+def forget_constants(ctx, names):
+    # The constants are known by tile, so they are forgotten for every variable placed on the same tile
+    if ANY_VARIABLE in names:
+        ctx.constants.clear()
+    for name in names:
+        if name in ctx.variables:
+            ctx.constants.pop(ctx.variables[name], None)
+
+
+def known_value(ctx, name):
+    # The value on the tile of the variable, None when it is not known at compile time
+    if name not in ctx.variables:
+        return None
+    return ctx.constants.get(ctx.variables[name])
+
+
+class ForgetConstants(BaseObject):
+    # Marks the end of code which may or may not have been executed, like the branches of an if
+    def __init__(self, names):
+        self.names = names
+
+    def compile(self, ctx):
+        forget_constants(ctx, self.names)
+
 
 class Block(BaseObject):
     def __init__(self, value):
@@ -12,12 +68,33 @@ class Block(BaseObject):
 
     def compile(self, ctx):
         for obj in self.value:
+            # The instructions of a statement belong to its line, the code after a nested block to the outer one
+            line = ctx.code.line
+            if obj.line:
+                ctx.code.line = obj.line
             obj.compile(ctx)
+            ctx.code.line = line
+
+    def changed_variables(self):
+        return set().union(*[obj.changed_variables() for obj in self.value])
+
+    def count_variables(self, uses, fixed, weight=1):
+        for obj in self.value:
+            obj.count_variables(uses, fixed, weight)
+
+    def statements(self):
+        # The statements of the block and of the blocks nested directly within it
+        for obj in self.value:
+            if isinstance(obj, Block):
+                for statement in obj.statements():
+                    yield statement
+            else:
+                yield obj
 
 
 class Input(BaseObject):
     def compile(self, ctx):
-        ctx.code.append("INBOX")
+        ctx.code.append(hrir.INBOX)
 
     def has_return_value(self):
         return True
@@ -30,10 +107,16 @@ class Output(BaseObject):
     def compile(self, ctx):
         if self.value.has_return_value():
             self.value.compile(ctx)
-            ctx.code.append("OUTBOX")
+            ctx.code.append(hrir.OUTBOX)
         else:
             raise Exception("Could not output a value of type without returnValue with object '" + self.value + "'")
 
+    def changed_variables(self):
+        return self.value.changed_variables()
+
+    def count_variables(self, uses, fixed, weight=1):
+        self.value.count_variables(uses, fixed, weight)
+
 
 class BasicVariable(BaseObject):
     def __init__(self, name, command, is_pointer=False):
@@ -46,27 +129,47 @@ class BasicVariable(BaseObject):
 
     def compile(self, ctx):
         if self.name in ctx.variables:
-            if self.is_pointer:
-                ctx.code.append(self.command + " [" + str(ctx.variables[self.name]) + "]")
-            else:
-                ctx.code.append(self.command + " " + str(ctx.variables[self.name]))
+            value = self.constant_value(ctx)
+            ctx.code.append(self.command, ctx.variables[self.name], self.is_pointer)
+            if self.command != hrir.COPYFROM:
+                forget_constants(ctx, self.changed_variables())
+                if value is not None:
+                    ctx.constants[ctx.variables[self.name]] = value
         else:
             raise Exception("Variable '" + self.name + "' is not defined")
 
+    def changed_variables(self):
+        if self.command == hrir.COPYFROM:
+            return set()
+        return set([ANY_VARIABLE if self.is_pointer else self.name])
+
+    def count_variables(self, uses, fixed, weight=1):
+        uses[self.name] += weight
+
+    def constant_value(self, ctx):
+        value = known_value(ctx, self.name)
+        if self.is_pointer or value is None:
+            return None
+        if self.command == hrir.BUMPUP:
+            return value + 1
+        if self.command == hrir.BUMPDN:
+            return value - 1
+        return value
+
 
 class ReadVariable(BasicVariable):
     def __init__(self, name, is_pointer=False):
-        super().__init__(name, "COPYFROM", is_pointer)
+        super().__init__(name, hrir.COPYFROM, is_pointer)
 
 
 class ReadVariablePlusOne(BasicVariable):
     def __init__(self, name, is_pointer=False):
-        super().__init__(name, "BUMPUP", is_pointer)
+        super().__init__(name, hrir.BUMPUP, is_pointer)
 
 
 class ReadVariableMinusOne(BasicVariable):
     def __init__(self, name, is_pointer=False):
-        super().__init__(name, "BUMPDN", is_pointer)
+        super().__init__(name, hrir.BUMPDN, is_pointer)
 
 
 class TwoVariablesExpression(BaseObject):
@@ -81,21 +184,37 @@ class TwoVariablesExpression(BaseObject):
 
     def compile(self, ctx):
         if self.leftObject in ctx.variables and self.rightObject in ctx.variables:
-            ctx.code.append("COPYFROM " + str(ctx.variables[self.leftObject]))
-            ctx.code.append(self.command + " " + str(ctx.variables[self.rightObject]))
+            ctx.code.append(hrir.COPYFROM, ctx.variables[self.leftObject])
+            ctx.code.append(self.command, ctx.variables[self.rightObject])
         else:
             raise Exception(self.exceptionName + ": Variable '" + self.leftObject +
                             "' or variable '" + self.rightObject + "' is undefined")
 
+    def count_variables(self, uses, fixed, weight=1):
+        uses[self.leftObject] += weight
+        uses[self.rightObject] += weight
+
+    def constant_value(self, ctx):
+        if self.command == hrir.SUB and self.leftObject == self.rightObject:
+            # Holds for letters as well
+            return 0
+        left = known_value(ctx, self.leftObject)
+        right = known_value(ctx, self.rightObject)
+        if left is None or right is None:
+            return None
+        if self.command == hrir.ADD:
+            return left + right
+        return left - right
+
 
 class Addition(TwoVariablesExpression):
     def __init__(self, left_object, right_object):
-        super().__init__(left_object, right_object, "ADD", "Addition")
+        super().__init__(left_object, right_object, hrir.ADD, "Addition")
 
 
 class Subtraction(TwoVariablesExpression):
     def __init__(self, left_object, right_object):
-        super().__init__(left_object, right_object, "SUB", "Subtraction")
+        super().__init__(left_object, right_object, hrir.SUB, "Subtraction")
 
 
 class AssignmentToFixMemoryAddress(BaseObject):
@@ -104,7 +223,17 @@ class AssignmentToFixMemoryAddress(BaseObject):
         self.number = number.value
 
     def compile(self, ctx):
-        ctx.variables[self.variableName] = int(self.number)
+        tile = int(self.number)
+        ctx.variables[self.variableName] = tile
+        ctx.fixedPositions.add(tile)
+
+    def changed_variables(self):
+        # Which tile the variable stands for afterwards depends on the order the code is compiled in, so code
+        # which may or may not place it keeps nothing known
+        return set([self.variableName, ANY_VARIABLE])
+
+    def count_variables(self, uses, fixed, weight=1):
+        fixed.setdefault(int(self.number), set()).add(self.variableName)
 
 
 class Assignment(BaseObject):
@@ -118,33 +247,44 @@ class Assignment(BaseObject):
 
     def compile(self, ctx):
         if self.value.has_return_value():
+            value = self.value.constant_value(ctx)
             self.value.compile(ctx)
-            if self.is_pointer:
-                ctx.code.append("COPYTO [" + str(ctx.getVariablePos(self.name)) + "]")
-            else:
-                ctx.code.append("COPYTO " + str(ctx.getVariablePos(self.name)))
+            ctx.code.append(hrir.COPYTO, ctx.getVariablePos(self.name), self.is_pointer)
+            forget_constants(ctx, self.changed_variables())
+            if value is not None and not self.is_pointer:
+                ctx.constants[ctx.variables[self.name]] = value
         else:
             raise Exception("Could not assign value of type without returnValue with object '" + self.value + "'")
 
+    def changed_variables(self):
+        return self.value.changed_variables() | set([ANY_VARIABLE if self.is_pointer else self.name])
+
+    def count_variables(self, uses, fixed, weight=1):
+        self.value.count_variables(uses, fixed, weight)
+        uses[self.name] += weight
+
+    def constant_value(self, ctx):
+        return self.value.constant_value(ctx)
+
 
 def compile_if_logic(compare_string, if_statements, else_statements, ctx):
     if compare_string == "!=" or compare_string == ">=":
-        command = "JUMPZ"
+        command = hrir.JUMPZ
         if compare_string == ">=":
-            command = "JUMPN"
+            command = hrir.JUMPN
         end_label = ctx.getNextLabel()
         if isinstance(else_statements, Block):
             else_label = ctx.getNextLabel()
-            ctx.code.append(command + " " + else_label)
+            ctx.code.append(command, else_label)
         else:
-            ctx.code.append(command + " " + end_label)
+            ctx.code.append(command, end_label)
         if_statements.compile(ctx)
         if isinstance(else_statements, Block):
-            ctx.code.append("JUMP " + end_label)
+            ctx.code.append(hrir.JUMP, end_label)
             # else_label
-            ctx.code.append(else_label + ":")
+            ctx.code.append(hrir.LABEL, else_label)
             else_statements.compile(ctx)
-        ctx.code.append(end_label + ":")
+        ctx.code.append(hrir.LABEL, end_label)
 
 
 class If(BaseObject):
@@ -154,14 +294,33 @@ class If(BaseObject):
         self.statement_else = statement_else
 
     def compile(self, ctx):
+        # Only one of the branches is executed, so what either of them changes is not known afterwards
+        changed = self.changed_variables()
+        forget_constants(ctx, changed)
+        statement_if = Block([self.statement_if, ForgetConstants(changed)])
+        statement_else = self.statement_else
+        if isinstance(statement_else, Block):
+            statement_else = Block([statement_else, ForgetConstants(changed)])
         # Ensure that the right thing is within the register
         self.comparison.compile(ctx)
         if self.comparison.compare_string == "!=" or self.comparison.compare_string == ">=":
-            compile_if_logic(self.comparison.compare_string, self.statement_if, self.statement_else, ctx)
+            compile_if_logic(self.comparison.compare_string, statement_if, statement_else, ctx)
         elif self.comparison.compare_string == "==":
-            compile_if_logic("!=", self.statement_else, self.statement_if, ctx)
+            compile_if_logic("!=", statement_else, statement_if, ctx)
         elif self.comparison.compare_string == "<":
-            compile_if_logic(">=", self.statement_else, self.statement_if, ctx)
+            compile_if_logic(">=", statement_else, statement_if, ctx)
+
+    def changed_variables(self):
+        return self.statement_if.changed_variables() | self.statement_else.changed_variables()
+
+    def count_variables(self, uses, fixed, weight=1):
+        # In the order of compile, which puts the else branch first for "==" and "<"
+        branches = [self.statement_if, self.statement_else]
+        if self.comparison.compare_string == "==" or self.comparison.compare_string == "<":
+            branches.reverse()
+        self.comparison.count_variables(uses, fixed, weight)
+        for branch in branches:
+            branch.count_variables(uses, fixed, weight)
 
 
 class Goto(BaseObject):
@@ -169,7 +328,7 @@ class Goto(BaseObject):
         self.label = label
 
     def compile(self, ctx):
-        ctx.code.append("JUMP " + self.label)
+        ctx.code.append(hrir.JUMP, self.label)
 
 
 class While(BaseObject):
@@ -178,19 +337,124 @@ class While(BaseObject):
         self.statement = statement
 
     def compile(self, ctx):
+        # The body of the plain loop is compiled once, so a "x=N;" within it moves x for the code after it only.
+        # Copies of the body would read the moved tiles from the second copy on, so such loops are not unrolled.
+        unroll = ctx.optimize and not self.declarations()
+        if unroll:
+            trips = self.trip_count(ctx)
+            if trips is not None and (trips <= 1 or ctx.favor == SPEED and trips <= MAX_UNROLL):
+                # The body is repeated without any comparison or jump, the code stays straight-line
+                for _ in range(trips):
+                    self.statement.compile(ctx)
+                return
+        # The beginning of the loop is reached from before the loop and from the end of the body
+        changed = self.changed_variables()
+        forget_constants(ctx, changed)
+        if ctx.optimize and (self.comparison.compare_string == "==" or self.comparison.compare_string == "<"):
+            self.compile_inverted(ctx)
+        elif unroll and ctx.favor == SPEED:
+            self.compile_unrolled(ctx)
+        else:
+            self.compile_loop(ctx)
+        forget_constants(ctx, changed)
+
+    def changed_variables(self):
+        return self.statement.changed_variables()
+
+    def count_variables(self, uses, fixed, weight=1):
+        self.comparison.count_variables(uses, fixed, weight * LOOP_WEIGHT)
+        self.statement.count_variables(uses, fixed, weight * LOOP_WEIGHT)
+
+    def declarations(self):
+        # The tiles which the body places variables on
+        fixed = {}
+        self.statement.count_variables(Counter(), fixed)
+        return fixed
+
+    def trip_count(self, ctx):
+        # Iterations of a loop whose operands are known and changed by one step in every iteration
+        left = self.comparison.left_operand
+        right = self.comparison.right_operand
+        left_value = known_value(ctx, left)
+        right_value = 0 if right == '0' else known_value(ctx, right)
+        if self.comparison.is_pointer or left_value is None or right_value is None:
+            return None
+        # Variables are compared by their tiles, two names may stand for the same one
+        left_tile = ctx.variables[left]
+        right_tile = None if right == '0' else ctx.variables[right]
+        if left_tile == right_tile:
+            return None
+        compared = set([left_tile, right_tile, ANY_VARIABLE]) - set([None])
+        difference = left_value - right_value
+        if not hrir.MIN_VALUE <= difference <= hrir.MAX_VALUE:
+            # The comparison itself overflows
+            return None
+        step = 0
+        for statement in self.statement.statements():
+            if isinstance(statement, BasicVariable) and statement.command != hrir.COPYFROM \
+                    and not statement.is_pointer and ctx.variables.get(statement.name) in compared:
+                change = 1 if statement.command == hrir.BUMPUP else -1
+                step += change if ctx.variables[statement.name] == left_tile else -change
+            elif set(ctx.variables.get(name, name) for name in statement.changed_variables()) & compared:
+                return None
+        compare_string = self.comparison.compare_string
+        if compare_string == "<" and step == 1:
+            return max(-difference, 0)
+        if compare_string == ">=" and step == -1:
+            return max(difference + 1, 0)
+        if compare_string == "!=" and step * difference <= 0 and abs(step) == 1:
+            return abs(difference)
+        if compare_string == "==" and step != 0:
+            return 1 if difference == 0 else 0
+        return None
+
+    def compile_loop(self, ctx):
         # Ensure that the right thing is within the register
         begin_label = ctx.getNextLabel()
-        ctx.code.append(begin_label + ":")
+        ctx.code.append(hrir.LABEL, begin_label)
         self.comparison.compile(ctx)
-        # Append the JUMP begin_label at the end of the statements
-        self.statement.value.append(Goto(begin_label))
+        # Append the JUMP begin_label at the end of the statements, without changing the tree
+        statement = Block(self.statement.value + [Goto(begin_label)])
         else_statement = BaseObject()
         if self.comparison.compare_string == "!=" or self.comparison.compare_string == ">=":
-            compile_if_logic(self.comparison.compare_string, self.statement, else_statement, ctx)
+            compile_if_logic(self.comparison.compare_string, statement, else_statement, ctx)
         elif self.comparison.compare_string == "==":
-            compile_if_logic("!=", else_statement, self.statement, ctx)
+            compile_if_logic("!=", else_statement, statement, ctx)
         elif self.comparison.compare_string == "<":
-            compile_if_logic(">=", else_statement, self.statement, ctx)
+            compile_if_logic(">=", else_statement, statement, ctx)
+
+    def compile_inverted(self, ctx):
+        # The comparison is at the end of the loop, so one conditional jump closes each iteration
+        body_label = ctx.getNextLabel()
+        test_label = ctx.getNextLabel()
+        ctx.code.append(hrir.JUMP, test_label)
+        ctx.code.append(hrir.LABEL, body_label)
+        # The comparison reads the tiles of the plain loop, where it is compiled before the body. A "x=N;" within the
+        # body must not move it.
+        variables = dict(ctx.variables)
+        self.statement.compile(ctx)
+        ctx.code.append(hrir.LABEL, test_label)
+        self.comparison.compile(ctx, variables)
+        if self.comparison.compare_string == "==":
+            ctx.code.append(hrir.JUMPZ, body_label)
+        else:
+            ctx.code.append(hrir.JUMPN, body_label)
+
+    def compile_unrolled(self, ctx):
+        # There is no jump for "not zero", so these loops can not be inverted. Instead the body is repeated and
+        # each copy is preceded by the comparison, the jump back is only needed after the last copy.
+        command = hrir.JUMPZ if self.comparison.compare_string == "!=" else hrir.JUMPN
+        begin_label = ctx.getNextLabel()
+        end_label = ctx.getNextLabel()
+        ctx.code.append(hrir.LABEL, begin_label)
+        # Every copy compares the same tiles, the ones of the plain loop
+        variables = dict(ctx.variables)
+        for _ in range(UNROLL_FACTOR):
+            self.comparison.compile(ctx, variables)
+            ctx.code.append(command, end_label)
+            self.statement.compile(ctx)
+        ctx.code.append(hrir.JUMP, begin_label)
+        ctx.code.append(hrir.LABEL, end_label)
 
 
 class Comparison(BaseObject):
@@ -200,17 +464,22 @@ class Comparison(BaseObject):
         self.right_operand = right_operand.value
         self.is_pointer = is_pointer
 
-    def compile(self, ctx):
-        if self.left_operand not in ctx.variables:
+    def compile(self, ctx, variables=None):
+        # variables are the positions to read, when they are not the current ones of ctx
+        if variables is None:
+            variables = ctx.variables
+        if self.left_operand not in variables:
             raise Exception("Variable '" + self.left_operand + "' is undefined")
-        if self.is_pointer:
-            ctx.code.append("COPYFROM [" + str(ctx.variables[self.left_operand]) + "]")
-        else:
-            ctx.code.append("COPYFROM " + str(ctx.variables[self.left_operand]))
+        ctx.code.append(hrir.COPYFROM, variables[self.left_operand], self.is_pointer)
         if self.right_operand != '0':
-            if self.right_operand not in ctx.variables:
+            if self.right_operand not in variables:
                 raise Exception("Variable '" + self.right_operand + "' is undefined")
-            ctx.code.append("SUB " + str(ctx.variables[self.right_operand]))
+            ctx.code.append(hrir.SUB, variables[self.right_operand])
+
+    def count_variables(self, uses, fixed, weight=1):
+        uses[self.left_operand] += weight
+        if self.right_operand != '0':
+            uses[self.right_operand] += weight
 
 
 class WhileTrue(BaseObject):
@@ -218,7 +487,14 @@ class WhileTrue(BaseObject):
         self.statements = statements
 
     def compile(self, ctx):
+        forget_constants(ctx, self.changed_variables())
         label = ctx.getNextLabel()
-        ctx.code.append(label + ":")
+        ctx.code.append(hrir.LABEL, label)
         self.statements.compile(ctx)
-        ctx.code.append("JUMP " + label)
+        ctx.code.append(hrir.JUMP, label)
+
+    def changed_variables(self):
+        return self.statements.changed_variables()
+
+    def count_variables(self, uses, fixed, weight=1):
+        self.statements.count_variables(uses, fixed, weight * LOOP_WEIGHT)
@@ -0,0 +1,106 @@
+from multiprocessing import Pool
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import time
+
+import hrc
+
+OUTPUT_EXTENSION = ".hrm"
+# Written next to the output, the hash of the source and the options it was compiled from
+KEY_EXTENSION = ".key"
+
+
+def find_sources(paths):
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(glob.glob(os.path.join(path, "**", "*.hc"), recursive=True))
+        else:
+            sources.extend(glob.glob(path, recursive=True))
+    return sorted(set(os.path.normpath(source) for source in sources))
+
+
+def output_path(source):
+    return os.path.splitext(source)[0] + OUTPUT_EXTENSION
+
+
+def key_path(source):
+    return output_path(source) + KEY_EXTENSION
+
+
+def build_key(code, optimize):
+    return hashlib.sha1(("optimize=%s\n" % bool(optimize) + code).encode()).hexdigest()
+
+
+def is_up_to_date(source, optimize=False):
+    # The output is kept when neither the source nor the options changed since it was written
+    if not os.path.exists(output_path(source)) or not os.path.exists(key_path(source)):
+        return False
+    with open(source, 'r') as f:
+        key = build_key(f.read(), optimize)
+    with open(key_path(source), 'r') as f:
+        return f.read().strip() == key
+
+
+def compile_file(source, optimize):
+    # Runs within the worker processes, which share the compiler built before the pool was started
+    start = time.perf_counter()
+    try:
+        with open(source, 'r') as f:
+            code = f.read()
+        compiled = hrc.getCompiler().compileIR(hrc.parse(code), optimize)
+        with open(output_path(source), 'w') as f:
+            f.write("\n".join(compiled.format()) + "\n")
+        with open(key_path(source), 'w') as f:
+            f.write(build_key(code, optimize) + "\n")
+    except Exception as e:
+        return source, "error", time.perf_counter() - start, 0, str(e)
+    return source, "compiled", time.perf_counter() - start, compiled.size(), None
+
+
+def compile_files(sources, optimize=False, force=False, jobs=None):
+    results = []
+    pending = []
+    for source in sources:
+        if not force and is_up_to_date(source, optimize):
+            results.append((source, "skipped", 0.0, 0, None))
+        else:
+            pending.append(source)
+    if pending:
+        # Build the lexer and parser before forking, so the workers do not have to
+        hrc.getCompiler()
+        with Pool(jobs, initializer=hrc.getCompiler) as pool:
+            results.extend(pool.starmap(compile_file, [(source, optimize) for source in pending]))
+    return sorted(results)
+
+
+def print_summary(results):
+    print("%-40s %-9s %10s %6s" % ("file", "status", "time [ms]", "size"))
+    for source, status, seconds, size, error in results:
+        print("%-40s %-9s %10.2f %6d" % (source, status, seconds * 1000, size))
+        if error is not None:
+            print("    " + error)
+    compiled = len([result for result in results if result[1] == "compiled"])
+    skipped = len([result for result in results if result[1] == "skipped"])
+    errors = len([result for result in results if result[1] == "error"])
+    print("%d compiled, %d skipped, %d failed" % (compiled, skipped, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help="Directories, .hc files or glob patterns")
+    parser.add_argument("-O", dest="optimize", action="store_true", help="Optimize the generated code")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("-f", "--force", action="store_true", help="Compile files which are up to date as well")
+    args = parser.parse_args()
+    results = compile_files(find_sources(args.paths), args.optimize, args.force, args.jobs)
+    print_summary(results)
+    if any(result[1] == "error" for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
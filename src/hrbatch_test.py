@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+import hrbatch
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write("a.hc", "output(input());")
+        self.write(os.path.join("sub", "b.hc"), "x=input(); output(x);")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, code):
+        path = os.path.join(self.directory, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(code)
+        return path
+
+    def test_find_sources(self):
+        sources = hrbatch.find_sources([self.directory])
+        self.assertEqual(["a.hc", os.path.join("sub", "b.hc")],
+                         [os.path.relpath(source, self.directory) for source in sources])
+        self.assertEqual(1, len(hrbatch.find_sources([os.path.join(self.directory, "*.hc")])))
+
+    def test_compile_and_skip(self):
+        sources = hrbatch.find_sources([self.directory])
+        results = hrbatch.compile_files(sources, jobs=2)
+        self.assertEqual(["compiled", "compiled"], [result[1] for result in results])
+        with open(os.path.join(self.directory, "a.hrm")) as f:
+            self.assertEqual("INBOX\nOUTBOX\n", f.read())
+        results = hrbatch.compile_files(sources, jobs=2)
+        self.assertEqual(["skipped", "skipped"], [result[1] for result in results])
+        results = hrbatch.compile_files(sources, force=True, jobs=2)
+        self.assertEqual(["compiled", "compiled"], [result[1] for result in results])
+
+    def test_recompile_on_change(self):
+        sources = hrbatch.find_sources([self.directory])
+        hrbatch.compile_files(sources, jobs=1)
+        # Other options give other code, so the outputs are compiled again
+        results = hrbatch.compile_files(sources, optimize=True, jobs=1)
+        self.assertEqual(["compiled", "compiled"], [result[1] for result in results])
+        results = hrbatch.compile_files(sources, optimize=True, jobs=1)
+        self.assertEqual(["skipped", "skipped"], [result[1] for result in results])
+        # The content counts, not the modification time
+        mtime = os.path.getmtime(sources[0])
+        self.write("a.hc", "x=input(); output(x); output(x);")
+        os.utime(sources[0], (mtime, mtime))
+        results = hrbatch.compile_files(sources, optimize=True, jobs=1)
+        self.assertEqual(["compiled", "skipped"], [result[1] for result in results])
+
+    def test_error(self):
+        source = self.write("broken.hc", "output(y);")
+        results = hrbatch.compile_files([source], jobs=1)
+        self.assertEqual("error", results[0][1])
+        self.assertFalse(os.path.exists(hrbatch.output_path(source)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,199 +1,672 @@
-from rply import LexerGenerator, ParserGenerator
+from collections import Counter, OrderedDict
+import re
+import sys
 import hrast
-import argparse
+import hrfloor
+import hrir
+
+# Only the modules needed to compile are imported up front, the command line is answered before rply, the optimizer
+# or argparse would be loaded. The parser tables are read from hrc_tables.py, written by "hrc.py --write-tables".
+
+TOKENS = [
+    ('SEMICOLON', r';'),
+    ('LPAREN', r'\('),
+    ('RPAREN', r'\)'),
+    ('LBRACE', r'\{'),
+    ('RBRACE', r'\}'),
+    ('IF', r'if'),
+    ('ELSE', r'else'),
+    ('INPUT', r'input'),
+    ('OUTPUT', r'output'),
+    ('TRUE', r'true'),
+    ('WHILE', r'while'),
+    ('EQUALS', r'='),
+    ('PLUS', r'\+'),
+    ('MINUS', r'\-'),
+    ('NOT', r'\!'),
+    ('BIGGER', r'\>'),
+    ('SMALLER', r'\<'),
+    ('NULL', r'0'),
+    ('NUMBER', r'[0-9]+'),
+    ('STAR', r'\*'),
+    ('VARIABLE', r'[a-zA-Z_][a-zA-Z0-9_]*'),
+]
+# Ignore all spaces and comments
+IGNORED = [r'\s+', r'\/\/[^\n]*\n']
+# The grammar rules with their functions, in the order of the rule numbers of the parser tables
+PRODUCTIONS = []
+TABLES_MODULE = "hrc_tables"
 
 
 def generateLexer():
+    from rply import LexerGenerator
     lg = LexerGenerator()
-    lg.add('SEMICOLON', r';')
-    lg.add('LPAREN', r'\(')
-    lg.add('RPAREN', r'\)')
-    lg.add('LBRACE', r'\{')
-    lg.add('RBRACE', r'\}')
-    lg.add('IF', r'if')
-    lg.add('ELSE', r'else')
-    lg.add('INPUT', r'input')
-    lg.add('OUTPUT', r'output')
-    lg.add('TRUE', r'true')
-    lg.add('WHILE', r'while')
-    lg.add('EQUALS', r'=')
-    lg.add('PLUS', r'\+')
-    lg.add('MINUS', r'\-')
-    lg.add('NOT', r'\!')
-    lg.add('BIGGER', r'\>')
-    lg.add('SMALLER', r'\<')
-    lg.add('NULL', r'0')
-    lg.add('NUMBER', r'[0-9]+')
-    lg.add('STAR', r'\*')
-    lg.add('VARIABLE', r'[a-zA-Z_][a-zA-Z0-9_]*')
-    # Ignore all spaces
-    lg.ignore(r'\s+')
-    lg.ignore(r'\/\/[^\n]*\n')
+    for name, pattern in TOKENS:
+        lg.add(name, pattern)
+    for pattern in IGNORED:
+        lg.ignore(pattern)
     return lg.build()
 
 
-class Context(object):
+class SourcePosition(object):
+    def __init__(self, idx, lineno, colno):
+        self.idx = idx
+        self.lineno = lineno
+        self.colno = colno
+
+    def __repr__(self):
+        return "SourcePosition(idx={0}, lineno={1}, colno={2})".format(self.idx, self.lineno, self.colno)
+
+
+class Token(object):
+    def __init__(self, name, value, source_pos):
+        self.name = name
+        self.value = value
+        self.source_pos = source_pos
+
+    def gettokentype(self):
+        return self.name
+
+    def getsourcepos(self):
+        return self.source_pos
+
+    def getstr(self):
+        return self.value
+
+
+class Lexer(object):
+    # Matches like the rply lexer: the ignored patterns first, then the first token rule which matches, not the
+    # longest one. One alternation of all rules keeps that order.
     def __init__(self):
-        self.code = []
+        self.ignored = re.compile("|".join(IGNORED))
+        self.tokens = re.compile("|".join("(?P<%s>%s)" % (name, pattern) for name, pattern in TOKENS))
+
+    def lex(self, code, offset=0, line=1, column=1):
+        # offset, line and column tell where code starts, when it is a part of a longer source
+        position = 0
+        while True:
+            match = self.ignored.match(code, position)
+            while match:
+                line += code.count("\n", position, match.end())
+                position = match.end()
+                match = self.ignored.match(code, position)
+            if position >= len(code):
+                return
+            match = self.tokens.match(code, position)
+            newline = code.rfind("\n", 0, position)
+            source_pos = SourcePosition(offset + position, line,
+                                        position - newline if newline != -1 else column + position)
+            if match is None:
+                from rply.errors import LexingError
+                raise LexingError(None, source_pos)
+            yield Token(match.lastgroup, match.group(), source_pos)
+            line += code.count("\n", position, match.end())
+            position = match.end()
+
+
+class TableParser(object):
+    # Drives the LALR tables like the rply parser does, without loading the parser generator
+    def __init__(self, actions, gotos, default_reductions):
+        self.actions = actions
+        self.gotos = gotos
+        self.defaultReductions = default_reductions
+        # Name, length and function of every rule, rule 0 accepts the program
+        self.rules = [None] + [(rule.split(":")[0].strip(), len(rule.split(":")[1].split()), function)
+                               for rule, function in PRODUCTIONS]
+
+    def parse(self, tokens):
+        end = Token("$end", "$end", None)
+        states = [0]
+        symbols = [end]
+        state = 0
+        lookahead = None
+        while True:
+            action = self.defaultReductions[state]
+            if not action:
+                if lookahead is None:
+                    lookahead = next(tokens, end)
+                if lookahead.name not in self.actions[state]:
+                    from rply.errors import ParsingError
+                    raise ParsingError(None, lookahead.getsourcepos())
+                action = self.actions[state][lookahead.name]
+                if action > 0:
+                    states.append(action)
+                    symbols.append(lookahead)
+                    state = action
+                    lookahead = None
+                    continue
+                if action == 0:
+                    return symbols[-1]
+            name, length, function = self.rules[-action]
+            arguments = symbols[len(symbols) - length:]
+            del symbols[len(symbols) - length:]
+            del states[len(states) - length:]
+            symbols.append(function(arguments))
+            state = self.gotos[states[-1]][name]
+            states.append(state)
+
+
+class Context(object):
+    def __init__(self, optimize=False, favor=hrast.SIZE, floorMap=None, plannedPositions=None):
+        self.code = hrir.Code()
+        self.optimize = optimize
+        # Whether the optimizer trades code size for fewer steps (hrast.SPEED) or not (hrast.SIZE)
+        self.favor = favor
         self.freeSpacePosition = 0
         # A = 0, B = 1, ...
         self.variables = {}
-        self.LABELS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        # Positions which were set by the user and must not be moved
+        self.fixedPositions = set()
+        # The data, the constants and the size of the floor, which the variables are placed around
+        self.floorMap = floorMap or hrfloor.FloorMap()
+        # Positions of the variables which were planned before compiling, see hrfloor.plan
+        self.plannedPositions = plannedPositions or {}
+        # Labels are numbers, they are named A, B, ..., Z, AA, AB, ... when the code is formatted
         self.currentLabelPosition = 0
+        # Values on the tiles which are known at compile time, at the statement which is compiled. The floor map
+        # tells the constants, they are never changed by the program.
+        self.constants = dict((tile, value) for tile, value in self.floorMap.constants.items()
+                              if isinstance(value, int))
 
     def getVariablePos(self, varName):
         if varName in self.variables:
             # return the position of the varName, when exists
             return self.variables[varName]
+        if varName in self.plannedPositions:
+            self.variables[varName] = self.plannedPositions[varName]
+            return self.variables[varName]
+        # The next tile which is not placed by the user, by the floor map or by the plan
+        taken = self.fixedPositions | self.floorMap.occupied() | set(self.plannedPositions.values())
+        while self.freeSpacePosition in taken:
+            self.freeSpacePosition += 1
         memory_position = self.freeSpacePosition
+        self.floorMap.check_tile(varName, memory_position)
         self.variables[varName] = memory_position
         self.freeSpacePosition = self.freeSpacePosition + 1
         return memory_position
 
     def getNextLabel(self):
-        nextLabel = self.LABELS[self.currentLabelPosition]
+        nextLabel = self.currentLabelPosition
         self.currentLabelPosition += 1
         return nextLabel
 
 
-def generateParser():
-    pg = ParserGenerator(['SEMICOLON', 'INPUT', 'OUTPUT',
-                          'LPAREN', 'RPAREN', 'EQUALS', 'VARIABLE',
-                          'PLUS', 'MINUS', 'LBRACE', 'RBRACE', 'IF',
-                          'NOT', 'NULL', 'WHILE', 'TRUE', 'NUMBER',
-                          'BIGGER', 'SMALLER', 'ELSE', 'STAR'])
-
-    @pg.production('main : statements')
-    def main_statement(s):
-        return s[0]
-
-    @pg.production('statements : statements statement')
-    def statements(s):
-        return hrast.Block(s[0].value + [s[1]])
-
-    @pg.production('statements : statement')
-    def statements_statement(s):
-        return hrast.Block([s[0]])
-
-    @pg.production('statement : expr SEMICOLON')
-    def statement(s):
-        return s[0]
-
-    @pg.production('expr : INPUT LPAREN RPAREN')
-    def expression_input(_):
-        return hrast.Input()
-
-    @pg.production('expr : OUTPUT LPAREN expr RPAREN')
-    def expression_output(s):
-        return hrast.Output(s[2])
-
-    @pg.production('expr : VARIABLE')
-    def expression_variable(s):
-        return hrast.ReadVariable(s[0])
-
-    @pg.production('expr : STAR VARIABLE')
-    def expression_variable(s):
-        return hrast.ReadVariable(s[1], True)
-
-    @pg.production('expr : VARIABLE PLUS PLUS')
-    def expression_add_one(s):
-        return hrast.ReadVariablePlusOne(s[0])
-
-    @pg.production('expr : LPAREN STAR VARIABLE RPAREN PLUS PLUS')
-    def expression_add_one_pointer(s):
-        return hrast.ReadVariablePlusOne(s[2], True)
-
-    @pg.production('expr : VARIABLE MINUS MINUS')
-    def expression_subtract_one(s):
-        return hrast.ReadVariableMinusOne(s[0])
-
-    @pg.production('expr : LPAREN STAR VARIABLE RPAREN MINUS MINUS')
-    def expression_subtract_one_pointer(s):
-        return hrast.ReadVariableMinusOne(s[2], True)
-
-    @pg.production('expr : VARIABLE PLUS VARIABLE')
-    def expression_addition(s):
-        return hrast.Addition(s[0], s[2])
-
-    @pg.production('expr : VARIABLE MINUS VARIABLE')
-    def expression_subtraction(s):
-        return hrast.Subtraction(s[0], s[2])
-
-    @pg.production('expr : VARIABLE EQUALS NULL')
-    @pg.production('expr : VARIABLE EQUALS NUMBER')
-    def expression_variable_to_fix_memory_address(s):
-        return hrast.AssignmentToFixMemoryAddress(s[0], s[2])
-
-    @pg.production('expr : STAR VARIABLE EQUALS expr')
-    def expression_assignment(s):
-        return hrast.Assignment(s[1], s[3], True)
-
-    @pg.production('expr : VARIABLE EQUALS expr')
-    def expression_assignment(s):
-        return hrast.Assignment(s[0], s[2])
-
-    @pg.production('statement : IF LPAREN comparison RPAREN LBRACE statements RBRACE ELSE LBRACE statements RBRACE')
-    def statement_if_with_else(s):
-        return hrast.If(s[2], hrast.Block([s[5]]), hrast.Block([s[9]]))
-
-    @pg.production('statement : IF LPAREN comparison RPAREN LBRACE statements RBRACE')
-    def statement_if(s):
-        return hrast.If(s[2], hrast.Block([s[5]]), hrast.BaseObject())
-
-    @pg.production('statement : WHILE LPAREN comparison RPAREN LBRACE statements RBRACE')
-    def statement_while(s):
-        return hrast.While(s[2], hrast.Block([s[5]]))
-
-    @pg.production('comparison : STAR VARIABLE SMALLER VARIABLE')
-    @pg.production('comparison : STAR VARIABLE SMALLER NULL')
-    def comparison_not_equals_null_pointer(s):
-        return hrast.Comparison(s[2].value, s[1], s[3], True)
-
-    @pg.production('comparison : VARIABLE SMALLER VARIABLE')
-    @pg.production('comparison : VARIABLE SMALLER NULL')
-    def comparison_not_equals_null(s):
-        return hrast.Comparison(s[1].value, s[0], s[2])
-
-    @pg.production('comparison : STAR VARIABLE BIGGER EQUALS VARIABLE')
-    @pg.production('comparison : STAR VARIABLE NOT EQUALS VARIABLE')
-    @pg.production('comparison : STAR VARIABLE EQUALS EQUALS VARIABLE')
-    @pg.production('comparison : STAR VARIABLE BIGGER EQUALS NULL')
-    @pg.production('comparison : STAR VARIABLE NOT EQUALS NULL')
-    @pg.production('comparison : STAR VARIABLE EQUALS EQUALS NULL')
-    def comparison_not_equals_null(s):
-        return hrast.Comparison(s[2].value + s[3].value, s[1], s[4], True)
-
-    @pg.production('comparison : VARIABLE BIGGER EQUALS VARIABLE')
-    @pg.production('comparison : VARIABLE NOT EQUALS VARIABLE')
-    @pg.production('comparison : VARIABLE EQUALS EQUALS VARIABLE')
-    @pg.production('comparison : VARIABLE BIGGER EQUALS NULL')
-    @pg.production('comparison : VARIABLE NOT EQUALS NULL')
-    @pg.production('comparison : VARIABLE EQUALS EQUALS NULL')
-    def comparison_not_equals_null(s):
-        return hrast.Comparison(s[1].value + s[2].value, s[0], s[3])
-
-    @pg.production('statement : WHILE LPAREN TRUE RPAREN LBRACE statements RBRACE')
-    def statement_while_true(s):
-        return hrast.WhileTrue(hrast.Block([s[5]]))
+def located(node, token):
+    # Remember the source line of the first token, so the instructions can be mapped back to it
+    node.line = token.getsourcepos().lineno
+    return node
+
+
+def production(rule):
+    def register(function):
+        PRODUCTIONS.append((rule, function))
+        return function
+    return register
+
+
+@production('main : statements')
+def main_statement(s):
+    return s[0]
+
+
+@production('statements : statements statement')
+def statements(s):
+    # Grow the block in place, copying the list on every statement would make parsing quadratic
+    s[0].value.append(s[1])
+    return s[0]
+
+
+@production('statements : statement')
+def statements_statement(s):
+    return hrast.Block([s[0]])
+
+
+@production('statement : expr SEMICOLON')
+def statement(s):
+    return s[0]
+
+
+@production('expr : INPUT LPAREN RPAREN')
+def expression_input(s):
+    return located(hrast.Input(), s[0])
+
+
+@production('expr : OUTPUT LPAREN expr RPAREN')
+def expression_output(s):
+    return located(hrast.Output(s[2]), s[0])
+
+
+@production('expr : VARIABLE')
+def expression_variable(s):
+    return located(hrast.ReadVariable(s[0]), s[0])
+
+
+@production('expr : STAR VARIABLE')
+def expression_pointer(s):
+    return located(hrast.ReadVariable(s[1], True), s[0])
+
+
+@production('expr : VARIABLE PLUS PLUS')
+def expression_add_one(s):
+    return located(hrast.ReadVariablePlusOne(s[0]), s[0])
 
+
+@production('expr : LPAREN STAR VARIABLE RPAREN PLUS PLUS')
+def expression_add_one_pointer(s):
+    return located(hrast.ReadVariablePlusOne(s[2], True), s[0])
+
+
+@production('expr : VARIABLE MINUS MINUS')
+def expression_subtract_one(s):
+    return located(hrast.ReadVariableMinusOne(s[0]), s[0])
+
+
+@production('expr : LPAREN STAR VARIABLE RPAREN MINUS MINUS')
+def expression_subtract_one_pointer(s):
+    return located(hrast.ReadVariableMinusOne(s[2], True), s[0])
+
+
+@production('expr : VARIABLE PLUS VARIABLE')
+def expression_addition(s):
+    return located(hrast.Addition(s[0], s[2]), s[0])
+
+
+@production('expr : VARIABLE MINUS VARIABLE')
+def expression_subtraction(s):
+    return located(hrast.Subtraction(s[0], s[2]), s[0])
+
+
+@production('expr : VARIABLE EQUALS NULL')
+@production('expr : VARIABLE EQUALS NUMBER')
+def expression_variable_to_fix_memory_address(s):
+    return located(hrast.AssignmentToFixMemoryAddress(s[0], s[2]), s[0])
+
+
+@production('expr : STAR VARIABLE EQUALS expr')
+def expression_pointer_assignment(s):
+    return located(hrast.Assignment(s[1], s[3], True), s[0])
+
+
+@production('expr : VARIABLE EQUALS expr')
+def expression_assignment(s):
+    return located(hrast.Assignment(s[0], s[2]), s[0])
+
+
+@production('statement : IF LPAREN comparison RPAREN LBRACE statements RBRACE ELSE LBRACE statements RBRACE')
+def statement_if_with_else(s):
+    return located(hrast.If(s[2], hrast.Block([s[5]]), hrast.Block([s[9]])), s[0])
+
+
+@production('statement : IF LPAREN comparison RPAREN LBRACE statements RBRACE')
+def statement_if(s):
+    return located(hrast.If(s[2], hrast.Block([s[5]]), hrast.BaseObject()), s[0])
+
+
+@production('statement : WHILE LPAREN comparison RPAREN LBRACE statements RBRACE')
+def statement_while(s):
+    return located(hrast.While(s[2], hrast.Block([s[5]])), s[0])
+
+
+@production('comparison : STAR VARIABLE SMALLER VARIABLE')
+@production('comparison : STAR VARIABLE SMALLER NULL')
+def comparison_not_equals_null_pointer(s):
+    return hrast.Comparison(s[2].value, s[1], s[3], True)
+
+
+@production('comparison : VARIABLE SMALLER VARIABLE')
+@production('comparison : VARIABLE SMALLER NULL')
+def comparison_smaller(s):
+    return hrast.Comparison(s[1].value, s[0], s[2])
+
+
+@production('comparison : STAR VARIABLE BIGGER EQUALS VARIABLE')
+@production('comparison : STAR VARIABLE NOT EQUALS VARIABLE')
+@production('comparison : STAR VARIABLE EQUALS EQUALS VARIABLE')
+@production('comparison : STAR VARIABLE BIGGER EQUALS NULL')
+@production('comparison : STAR VARIABLE NOT EQUALS NULL')
+@production('comparison : STAR VARIABLE EQUALS EQUALS NULL')
+def comparison_pointer(s):
+    return hrast.Comparison(s[2].value + s[3].value, s[1], s[4], True)
+
+
+@production('comparison : VARIABLE BIGGER EQUALS VARIABLE')
+@production('comparison : VARIABLE NOT EQUALS VARIABLE')
+@production('comparison : VARIABLE EQUALS EQUALS VARIABLE')
+@production('comparison : VARIABLE BIGGER EQUALS NULL')
+@production('comparison : VARIABLE NOT EQUALS NULL')
+@production('comparison : VARIABLE EQUALS EQUALS NULL')
+def comparison(s):
+    return hrast.Comparison(s[1].value + s[2].value, s[0], s[3])
+
+
+@production('statement : WHILE LPAREN TRUE RPAREN LBRACE statements RBRACE')
+def statement_while_true(s):
+    return located(hrast.WhileTrue(hrast.Block([s[5]])), s[0])
+
+
+def generateParser():
+    from rply import ParserGenerator
+    pg = ParserGenerator([name for name, _ in TOKENS],
+                         # rply stores the LALR tables on disk, keyed by a hash of the grammar
+                         cache_id="hrc")
+    for rule, function in PRODUCTIONS:
+        pg.production(rule)(function)
     return pg.build()
 
 
-def compile(code):
-    l = generateLexer()
-    p = generateParser()
-    ctx = Context()
-    p.parse(l.lex(code)).compile(ctx)
-    return ctx.code
+def loadParser():
+    # The tables of hrc_tables.py, unless the grammar was changed afterwards, then rply builds the parser
+    try:
+        tables = __import__(TABLES_MODULE)
+    except ImportError:
+        return generateParser()
+    if tables.RULES != [rule for rule, _ in PRODUCTIONS]:
+        return generateParser()
+    return TableParser(tables.ACTIONS, tables.GOTOS, tables.DEFAULT_REDUCTIONS)
+
+
+def writeTables(path):
+    table = generateParser().lr_table
+    with open(path, 'w') as f:
+        f.write("# Generated by \"hrc.py --write-tables\" from the grammar in hrc.py, do not edit\n")
+        writeList(f, "RULES", [rule for rule, _ in PRODUCTIONS])
+        writeList(f, "ACTIONS", [dict(sorted(action.items())) for action in table.lr_action])
+        writeList(f, "GOTOS", [dict(sorted(goto.items())) for goto in table.lr_goto])
+        writeList(f, "DEFAULT_REDUCTIONS", list(table.default_reductions))
+
+
+def writeList(f, name, values):
+    # One entry per line, so a change of the grammar gives a readable diff
+    f.write(name + " = [\n")
+    for value in values:
+        f.write("    %r,\n" % (value,))
+    f.write("]\n")
+
+
+CHUNK_SIZE = 65536
+# The kinds of the pieces of splitStatements
+STATEMENT = "statement"
+LOOP = "loop"
+END = "end"
+# The head of an endless loop up to its brace, spaces and comments may be anywhere in between
+SEPARATOR = "(?:" + "|".join(IGNORED) + ")*"
+WHILE_TRUE = re.compile(SEPARATOR + SEPARATOR.join([r'while', r'\(', r'true', r'\)', r'\{']))
+
+
+def splitStatements(stream, chunk_size=CHUNK_SIZE):
+    # Yields the top level statements one after the other as (STATEMENT, source), reading the stream in chunks.
+    # The statements of a "while (true) { ... }" are yielded one by one as well, between (LOOP, source of the head)
+    # and (END, source up to the closing brace). The pieces follow each other without gaps.
+    text = ""
+    start = 0
+    position = 0
+    depth = 0
+    # Number of the endless loops whose statements are yielded one by one, which are not closed yet
+    loops = 0
+    # A block statement was closed, but it is continued when an else follows
+    waiting = False
+    significant = False
+    # End of the last character which is neither space nor comment
+    last = 0
+    eof = False
+    while True:
+        comment = text.startswith("//", position)
+        if not eof and (len(text) - position < len("else") or comment and text.find("\n", position) == -1):
+            # At least as much as is kept, so a long statement is only copied a few times while it is read
+            chunk = stream.read(max(chunk_size, len(text) - start))
+            if chunk:
+                # Drop the statements which were already handed out
+                text = text[start:] + chunk
+                position -= start
+                last = max(last - start, 0)
+                start = 0
+                continue
+            eof = True
+        if position >= len(text):
+            break
+        if comment:
+            end = text.find("\n", position)
+            position = len(text) if end == -1 else end + 1
+            continue
+        char = text[position]
+        if waiting and not char.isspace():
+            waiting = False
+            if not text.startswith("else", position):
+                yield STATEMENT, text[start:position]
+                start = position
+                significant = False
+        if char == "}" and depth == 0 and loops:
+            # The brace ends a statement which misses its semicolon, the parser reports it there
+            yield STATEMENT if significant else END, text[start:position + 1]
+            start = position + 1
+            significant = False
+            loops -= 1
+            position += 1
+            continue
+        if not char.isspace():
+            significant = True
+            last = position + 1
+        if char == "{":
+            depth += 1
+            if depth == 1 and WHILE_TRUE.fullmatch(text, start, position + 1):
+                yield LOOP, text[start:position + 1]
+                start = position + 1
+                significant = False
+                depth = 0
+                loops += 1
+        elif char == "}":
+            depth -= 1
+            waiting = depth == 0
+        elif char == ";" and depth == 0:
+            yield STATEMENT, text[start:position + 1]
+            start = position + 1
+            significant = False
+        position += 1
+    if significant:
+        yield STATEMENT, text[start:last]
+
+
+class Compiler(object):
+    def __init__(self, cache_size=256):
+        # Building the lexer and the parser tables is expensive, so it is done once per compiler
+        self.lexer = Lexer()
+        self.parser = loadParser()
+        # Parsed trees by the hash of their source code, the least recently used one is dropped first
+        self.trees = OrderedDict()
+        self.cacheSize = cache_size
+
+    def parse(self, code):
+        import hashlib
+        key = hashlib.sha1(code.encode()).hexdigest()
+        if key in self.trees:
+            self.trees.move_to_end(key)
+            return self.trees[key]
+        tree = self.parser.parse(self.lexer.lex(code))
+        self.trees[key] = tree
+        if len(self.trees) > self.cacheSize:
+            self.trees.popitem(last=False)
+        return tree
+
+    def compileIR(self, tree, optimize=False, samples=None, favor=hrast.SIZE, floor_map=None):
+        # Compiling does not change the tree, so one tree can be compiled many times
+        positions = hrfloor.plan(tree, floor_map)
+        floor_map = floor_map or hrfloor.FloorMap()
+        ctx = Context(optimize, favor, floor_map, positions)
+        tree.compile(ctx)
+        code = ctx.code
+        if optimize:
+            import hropt
+            code = hropt.optimize(code, ctx.fixedPositions | floor_map.occupied(), samples)
+        hrfloor.check_code(code, floor_map)
+        return code
+
+    def compileTree(self, tree, optimize=False, samples=None, favor=hrast.SIZE, floor_map=None):
+        # The instructions are only turned into text once, at the very end
+        return self.compileIR(tree, optimize, samples, favor, floor_map).format()
+
+    def compile(self, code, optimize=False, samples=None, favor=hrast.SIZE, floor_map=None):
+        return self.compileTree(self.parse(code), optimize, samples, favor, floor_map)
+
+    def parseStatements(self, stream, chunk_size=CHUNK_SIZE):
+        # The pieces of splitStatements as (STATEMENT, tree), (LOOP, line) and (END, line), where line is the one of
+        # the loop. Their positions count from the start of the stream.
+        offset, lineno, colno = 0, 1, 1
+        loops = []
+        previous = None
+        for kind, source in splitStatements(stream, chunk_size):
+            tokens = self.lexer.lex(source, offset, lineno, colno)
+            if kind == STATEMENT:
+                yield kind, self.parser.parse(tokens)
+            elif kind == LOOP:
+                loops.append(next(tokens).getsourcepos().lineno)
+                yield kind, loops[-1]
+            else:
+                if previous == LOOP:
+                    # A loop needs a statement, the parser tells where it is missing
+                    self.parser.parse(tokens)
+                yield kind, loops.pop()
+            previous = kind
+            # The pieces follow each other without gaps, so the next one starts where this one ends
+            offset += len(source)
+            lineno += source.count("\n")
+            newline = source.rfind("\n")
+            colno = len(source) - newline if newline != -1 else colno + len(source)
+        if loops:
+            # The stream ended within a loop
+            from rply.errors import ParsingError
+            raise ParsingError(None, None)
+
+    def compileStream(self, stream, output, chunk_size=CHUNK_SIZE, floor_map=None):
+        # Every statement is parsed and written on its own, so the memory does not grow with the source. The
+        # statements of the endless loops are compiled one by one too, an if or a while with a condition is parsed
+        # as a whole. The jumps of a statement only target labels of the same statement or of the loops around it,
+        # so no fixups are needed afterwards.
+        # The variables are placed like compileIR does, which needs the whole program. So the statements are read
+        # twice, first to count the variables and to find the tiles placed by the program, then to compile them.
+        if not stream.seekable():
+            import shutil
+            import tempfile
+            with tempfile.TemporaryFile('w+', encoding="utf-8") as copy:
+                shutil.copyfileobj(stream, copy, chunk_size)
+                copy.seek(0)
+                return self.compileStream(copy, output, chunk_size, floor_map)
+        start = stream.tell()
+        uses = Counter()
+        fixed = {}
+        # The variables changed within each endless loop, in the order of their heads
+        changed = []
+        loops = []
+        weight = 1
+        for kind, tree in self.parseStatements(stream, chunk_size):
+            if kind == LOOP:
+                loops.append(len(changed))
+                changed.append(set())
+                weight *= hrast.LOOP_WEIGHT
+            elif kind == END:
+                names = changed[loops.pop()]
+                if loops:
+                    changed[loops[-1]] |= names
+                weight //= hrast.LOOP_WEIGHT
+            else:
+                tree.count_variables(uses, fixed, weight)
+                if loops:
+                    changed[loops[-1]] |= tree.changed_variables()
+        stream.seek(start)
+        positions = hrfloor.place(uses, fixed, floor_map)
+        floor_map = floor_map or hrfloor.FloorMap()
+        ctx = Context(floorMap=floor_map, plannedPositions=positions)
+        changed = iter(changed)
+        # The labels and the lines of the loops which are not closed yet
+        labels = []
+        for kind, tree in self.parseStatements(stream, chunk_size):
+            if kind == LOOP:
+                # Like hrast.WhileTrue.compile does
+                hrast.forget_constants(ctx, next(changed))
+                labels.append((ctx.getNextLabel(), tree))
+                ctx.code.line = tree
+                ctx.code.append(hrir.LABEL, labels[-1][0])
+            elif kind == END:
+                label, line = labels.pop()
+                ctx.code.append(hrir.JUMP, label, line=line)
+                ctx.code.line = labels[-1][1] if labels else 0
+            else:
+                tree.compile(ctx)
+            hrfloor.check_code(ctx.code, floor_map)
+            for line in ctx.code.format():
+                output.write(line + "\n")
+            ctx.code.clear()
+
+
+_compiler = None
+
+
+def getCompiler():
+    global _compiler
+    if _compiler is None:
+        _compiler = Compiler()
+    return _compiler
+
+
+def parse(code):
+    return getCompiler().parse(code)
+
+
+def compile(code, optimize=False, samples=None, favor=hrast.SIZE, floor_map=None):
+    return getCompiler().compile(code, optimize, samples, favor, floor_map)
 
 
 def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("inputfile", help="The input file where the hrc code lays")
+    if len(sys.argv) == 2 and not sys.argv[1].startswith("-"):
+        # Just a file to compile, which is the common case and does not need the option parser
+        with open(sys.argv[1], 'r') as f:
+            getCompiler().compileStream(f, sys.stdout)
+        return
+    import argparse
+    import hrsim
+    import hrsuper
+    parser = argparse.ArgumentParser(
+        description="Without -O the code is written while the file is read, statement by statement. The statements "
+                    "within while (true) are compiled one by one too, an if or a while with a condition is read as a "
+                    "whole.")
+    parser.add_argument("inputfile", nargs="?", help="The input file where the hrc code lays")
+    parser.add_argument("-O", dest="optimize", action="store_true", help="Optimize the generated code")
+    parser.add_argument("--profile", help="File with sample inboxes, the hot path of -O code falls through")
+    parser.add_argument("--favor", choices=[hrast.SPEED, hrast.SIZE], default=hrast.SIZE,
+                        help="Whether -O may make the code longer to save steps, by unrolling loops")
+    parser.add_argument("--superopt", action="store_true",
+                        help="Search shorter equivalents of the straight-line code, implies -O")
+    parser.add_argument("--budget", type=float, default=hrsuper.BUDGET, help="Seconds for --superopt")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes for --superopt")
+    parser.add_argument("--floor-map", metavar="FILE",
+                        help="File with the tiles holding data or constants and the number of tiles, see hrfloor.py")
+    parser.add_argument("--write-tables", metavar="PATH",
+                        help="Write the parser tables of the grammar, they are loaded from " + TABLES_MODULE + ".py")
     args = parser.parse_args()
+    if args.write_tables:
+        writeTables(args.write_tables)
+        return
+    if args.inputfile is None:
+        parser.error("the following arguments are required: inputfile")
+    floor_map = None
+    if args.floor_map:
+        floor_map = hrfloor.load(args.floor_map)
+    if not args.optimize and not args.superopt:
+        # The optimizer needs the whole program, without it the code is written while reading the file
+        with open(args.inputfile, 'r') as f:
+            getCompiler().compileStream(f, sys.stdout, floor_map=floor_map)
+        return
     code = open(args.inputfile, 'r').read()
-    compiled = compile(code)
-    for line in compiled:
+    samples = None
+    if args.profile:
+        samples = hrsim.load_samples(args.profile)
+    optimize = args.optimize or args.superopt
+    compiled = getCompiler().compileIR(parse(code), optimize, samples, args.favor, floor_map)
+    if args.superopt:
+        compiled = hrsuper.superoptimize(compiled, args.budget, args.jobs)
+        if floor_map is not None:
+            # A tile which is not read any more may have been reused for another value
+            hrfloor.check_code(compiled, floor_map)
+    for line in compiled.format():
         print(line)
 
 
@@ -0,0 +1,283 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import hrc
+import hrsim
+
+EXAMPLES_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples"))
+# Inbox, floor and expected outbox per level together with the size and speed goals of the game
+FIXTURES_FILE = os.path.join(EXAMPLES_DIR, "fixtures.json")
+BASELINE_FILE = os.path.join(EXAMPLES_DIR, "baseline.json")
+COUNT_METRICS = ["size", "size_O", "steps", "steps_O"]
+TIME_METRICS = ["parse_ms", "codegen_ms", "codegen_O_ms"]
+# Timings only count as regression when they are slower by this factor and by more than MIN_TIME_DIFFERENCE_MS
+TIME_TOLERANCE = 2.0
+MIN_TIME_DIFFERENCE_MS = 0.5
+HRC_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hrc.py")
+STARTUP_FILE = os.path.join(EXAMPLES_DIR, "level01.hc")
+# Wall time of "hrc.py level01.hc" from starting the interpreter to its exit
+STARTUP_TARGET_MS = 50.0
+
+
+def load_examples(directory=EXAMPLES_DIR):
+    examples = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.hc"))):
+        with open(path, 'r') as f:
+            examples.append((os.path.basename(path), f.read()))
+    return examples
+
+
+def compile_uncached(code):
+    # The behaviour before the compiler was cached: build lexer and parser for every call
+    ctx = hrc.Context()
+    hrc.generateParser().parse(hrc.generateLexer().lex(code)).compile(ctx)
+    return ctx.code
+
+
+def compile_without_cache(compiler, code):
+    return compiler.compileTree(compiler.parser.parse(compiler.lexer.lex(code)))
+
+
+def measure(function, code, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(code)
+    return (time.perf_counter() - start) / repeat
+
+
+def measure_best(function, argument, repeat):
+    # The fastest run is less disturbed by other processes than the average
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_compile(examples, args):
+    repeat = args.repeat
+    compiler = hrc.Compiler()
+    print("%-20s %14s %14s %10s" % ("file", "uncached [ms]", "cached [ms]", "speedup"))
+    total_uncached = 0.0
+    total_cached = 0.0
+    for name, code in examples:
+        uncached = measure(compile_uncached, code, repeat)
+        cached = measure(lambda source: compile_without_cache(compiler, source), code, repeat)
+        total_uncached += uncached
+        total_cached += cached
+        print("%-20s %14.3f %14.3f %9.1fx" % (name, uncached * 1000, cached * 1000, uncached / cached))
+    print("%-20s %14.3f %14.3f %9.1fx" % ("total", total_uncached * 1000, total_cached * 1000,
+                                          total_uncached / total_cached))
+
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def fixture_floor(fixture):
+    return dict((int(position), value) for position, value in fixture.get("floor", {}).items())
+
+
+def measure_level(compiler, code, fixture, repeat=1):
+    # Returns the metrics of one level and the outboxes of the plain and the optimized code
+    parse = measure_best(lambda source: compiler.parser.parse(compiler.lexer.lex(source)), code, repeat)
+    tree = compiler.parser.parse(compiler.lexer.lex(code))
+    codegen = measure_best(compiler.compileTree, tree, repeat)
+    codegen_optimized = measure_best(lambda t: compiler.compileTree(t, optimize=True), tree, repeat)
+    plain = hrsim.run(compiler.compileIR(tree), fixture["inbox"], fixture_floor(fixture))
+    optimized = hrsim.run(compiler.compileIR(tree, optimize=True), fixture["inbox"], fixture_floor(fixture))
+    metrics = {
+        "parse_ms": round(parse * 1000, 4),
+        "codegen_ms": round(codegen * 1000, 4),
+        "codegen_O_ms": round(codegen_optimized * 1000, 4),
+        "size": plain.size,
+        "size_O": optimized.size,
+        "steps": plain.steps,
+        "steps_O": optimized.steps,
+    }
+    return metrics, plain.outbox, optimized.outbox
+
+
+def bench_optimize(examples, args):
+    compiler = hrc.Compiler()
+    fixtures = load_json(FIXTURES_FILE)
+    print("%-20s %8s %8s %8s %8s %8s %8s" % ("file", "size", "size -O", "saved", "steps", "steps -O", "saved"))
+    for name, code in examples:
+        if name not in fixtures:
+            continue
+        metrics, _, _ = measure_level(compiler, code, fixtures[name])
+        print("%-20s %8d %8d %8d %8d %8d %8d" % (name, metrics["size"], metrics["size_O"],
+                                                 metrics["size"] - metrics["size_O"], metrics["steps"],
+                                                 metrics["steps_O"], metrics["steps"] - metrics["steps_O"]))
+
+
+def find_regressions(results, baseline, time_tolerance=TIME_TOLERANCE):
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        if name not in baseline:
+            continue
+        for key in COUNT_METRICS:
+            if metrics[key] > baseline[name][key]:
+                regressions.append("%s: %s %d > %d" % (name, key, metrics[key], baseline[name][key]))
+        for key in TIME_METRICS:
+            if (metrics[key] > baseline[name][key] * time_tolerance and
+                    metrics[key] - baseline[name][key] > MIN_TIME_DIFFERENCE_MS):
+                regressions.append("%s: %s %.3f > %.3f" % (name, key, metrics[key], baseline[name][key]))
+    return regressions
+
+
+def bench_regression(examples, args):
+    compiler = hrc.Compiler()
+    fixtures = load_json(FIXTURES_FILE)
+    results = {}
+    failures = []
+    print("%-20s %8s %8s %8s %6s %6s %5s %6s %6s %6s" % ("file", "parse", "codegen", "cg -O", "size", "-O",
+                                                          "goal", "steps", "-O", "goal"))
+    for name, code in examples:
+        if name not in fixtures:
+            continue
+        fixture = fixtures[name]
+        metrics, plain_outbox, optimized_outbox = measure_level(compiler, code, fixture, args.repeat)
+        results[name] = metrics
+        for outbox, kind in [(plain_outbox, "plain"), (optimized_outbox, "optimized")]:
+            if outbox != fixture["outbox"]:
+                failures.append("%s: wrong outbox of the %s code %s" % (name, kind, outbox))
+        print("%-20s %8.3f %8.3f %8.3f %6d %6d %5d %6d %6d %6d" % (
+            name, metrics["parse_ms"], metrics["codegen_ms"], metrics["codegen_O_ms"], metrics["size"],
+            metrics["size_O"], fixture["size_goal"], metrics["steps"], metrics["steps_O"], fixture["speed_goal"]))
+    if args.update_baseline:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("Baseline written to " + BASELINE_FILE)
+    elif os.path.exists(BASELINE_FILE):
+        failures.extend(find_regressions(results, load_json(BASELINE_FILE), args.time_tolerance))
+    for failure in failures:
+        print("REGRESSION " + failure)
+    if failures:
+        sys.exit(1)
+
+
+def synthetic_program(statements):
+    lines = ["a=input();"]
+    for i in range(statements - 1):
+        lines.append("output(a);" if i % 2 else "a=a+a;")
+    return "\n".join(lines)
+
+
+def bench_parse_scaling(examples, args):
+    compiler = hrc.Compiler()
+    print("%-12s %12s %16s" % ("statements", "parse [ms]", "per stmt [us]"))
+    for statements in (1000, 10000, 100000):
+        code = synthetic_program(statements)
+        start = time.perf_counter()
+        compiler.parser.parse(compiler.lexer.lex(code))
+        elapsed = time.perf_counter() - start
+        print("%-12d %12.1f %16.2f" % (statements, elapsed * 1000, elapsed / statements * 1000000))
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_stream_memory(examples, args):
+    compiler = hrc.Compiler()
+    print("%-12s %18s %18s %18s" % ("statements", "whole file [KiB]", "streaming [KiB]", "in a loop [KiB]"))
+    for statements in (1000, 10000, 100000):
+        paths = []
+        for code in (synthetic_program(statements), "while(true) {\n" + synthetic_program(statements) + "\n}"):
+            with tempfile.NamedTemporaryFile('w', suffix=".hc", delete=False) as f:
+                f.write(code)
+            paths.append(f.name)
+        try:
+            def whole():
+                with open(paths[0], 'r') as source:
+                    compiler.compileTree(compiler.parser.parse(compiler.lexer.lex(source.read())))
+
+            def streaming(path):
+                with open(path, 'r') as source, open(os.devnull, 'w') as output:
+                    compiler.compileStream(source, output)
+
+            print("%-12d %18d %18d %18d" % (statements, peak_memory(whole) // 1024,
+                                            peak_memory(lambda: streaming(paths[0])) // 1024,
+                                            peak_memory(lambda: streaming(paths[1])) // 1024))
+        finally:
+            for path in paths:
+                os.remove(path)
+
+
+def parse_importtime(output):
+    # The lines of "python -X importtime" as (module, own time, cumulative time), the times in microseconds
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(own), int(cumulative)))
+    return modules
+
+
+def startup_time(path, repeat):
+    command = [sys.executable, HRC_FILE, path]
+    return measure_best(lambda _: subprocess.run(command, stdout=subprocess.DEVNULL, check=True), None, repeat)
+
+
+def bench_startup(examples, args):
+    command = [sys.executable, "-X", "importtime", HRC_FILE, STARTUP_FILE]
+    output = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True,
+                            check=True).stderr
+    modules = parse_importtime(output)
+    print("%-30s %10s %12s" % ("module", "self [ms]", "total [ms]"))
+    for name, own, cumulative in sorted(modules, key=lambda module: -module[2])[:10]:
+        print("%-30s %10.1f %12.1f" % (name, own / 1000, cumulative / 1000))
+    interpreter = measure_best(lambda _: subprocess.run([sys.executable, "-c", "pass"], check=True), None,
+                               args.repeat)
+    startup = startup_time(STARTUP_FILE, args.repeat)
+    print("interpreter %.1f ms, hrc.py %s %.1f ms, target %.1f ms" % (
+        interpreter * 1000, os.path.basename(STARTUP_FILE), startup * 1000, STARTUP_TARGET_MS))
+    if startup * 1000 > STARTUP_TARGET_MS:
+        print("REGRESSION startup %.1f ms > %.1f ms" % (startup * 1000, STARTUP_TARGET_MS))
+        sys.exit(1)
+
+
+BENCHMARKS = {
+    "compile": bench_compile,
+    "optimize": bench_optimize,
+    "parse-scaling": bench_parse_scaling,
+    "regression": bench_regression,
+    "startup": bench_startup,
+    "stream-memory": bench_stream_memory,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("benchmark", nargs="?", default="compile", choices=sorted(BENCHMARKS),
+                        help="The benchmark to run")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of compilations per file")
+    parser.add_argument("--examples", default=EXAMPLES_DIR, help="Directory with the .hc files")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE,
+                        help="Factor by which the timings may be slower than the baseline")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](load_examples(args.examples), args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+import unittest
+import hrc
+import hrc_bench
+
+
+class RegressionTestCase(unittest.TestCase):
+    def test_examples_against_baseline(self):
+        # Only the counted metrics are checked here, the timings depend on the machine
+        compiler = hrc.Compiler()
+        fixtures = hrc_bench.load_json(hrc_bench.FIXTURES_FILE)
+        baseline = hrc_bench.load_json(hrc_bench.BASELINE_FILE)
+        for name, code in hrc_bench.load_examples():
+            fixture = fixtures[name]
+            metrics, plain_outbox, optimized_outbox = hrc_bench.measure_level(compiler, code, fixture)
+            self.assertEqual(fixture["outbox"], plain_outbox, name)
+            self.assertEqual(fixture["outbox"], optimized_outbox, name)
+            for key in hrc_bench.COUNT_METRICS:
+                self.assertLessEqual(metrics[key], baseline[name][key], name + " " + key)
+
+    def test_find_regressions(self):
+        baseline = {"a.hc": {"size": 5, "size_O": 4, "steps": 10, "steps_O": 8,
+                             "parse_ms": 1.0, "codegen_ms": 1.0, "codegen_O_ms": 1.0}}
+        results = {"a.hc": dict(baseline["a.hc"], steps_O=9, parse_ms=1.2, codegen_O_ms=3.0)}
+        self.assertEqual(["a.hc: steps_O 9 > 8", "a.hc: codegen_O_ms 3.000 > 1.000"],
+                         hrc_bench.find_regressions(results, baseline))
+
+    def test_fixture_for_every_example(self):
+        fixtures = hrc_bench.load_json(hrc_bench.FIXTURES_FILE)
+        self.assertEqual(sorted(fixtures), [name for name, _ in hrc_bench.load_examples()])
+        self.assertTrue(os.path.exists(hrc_bench.BASELINE_FILE))
+
+
+if __name__ == '__main__':
+    unittest.main()
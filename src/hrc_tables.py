@@ -0,0 +1,326 @@
+# Generated by "hrc.py --write-tables" from the grammar in hrc.py, do not edit
+RULES = [
+    'main : statements',
+    'statements : statements statement',
+    'statements : statement',
+    'statement : expr SEMICOLON',
+    'expr : INPUT LPAREN RPAREN',
+    'expr : OUTPUT LPAREN expr RPAREN',
+    'expr : VARIABLE',
+    'expr : STAR VARIABLE',
+    'expr : VARIABLE PLUS PLUS',
+    'expr : LPAREN STAR VARIABLE RPAREN PLUS PLUS',
+    'expr : VARIABLE MINUS MINUS',
+    'expr : LPAREN STAR VARIABLE RPAREN MINUS MINUS',
+    'expr : VARIABLE PLUS VARIABLE',
+    'expr : VARIABLE MINUS VARIABLE',
+    'expr : VARIABLE EQUALS NUMBER',
+    'expr : VARIABLE EQUALS NULL',
+    'expr : STAR VARIABLE EQUALS expr',
+    'expr : VARIABLE EQUALS expr',
+    'statement : IF LPAREN comparison RPAREN LBRACE statements RBRACE ELSE LBRACE statements RBRACE',
+    'statement : IF LPAREN comparison RPAREN LBRACE statements RBRACE',
+    'statement : WHILE LPAREN comparison RPAREN LBRACE statements RBRACE',
+    'comparison : STAR VARIABLE SMALLER NULL',
+    'comparison : STAR VARIABLE SMALLER VARIABLE',
+    'comparison : VARIABLE SMALLER NULL',
+    'comparison : VARIABLE SMALLER VARIABLE',
+    'comparison : STAR VARIABLE EQUALS EQUALS NULL',
+    'comparison : STAR VARIABLE NOT EQUALS NULL',
+    'comparison : STAR VARIABLE BIGGER EQUALS NULL',
+    'comparison : STAR VARIABLE EQUALS EQUALS VARIABLE',
+    'comparison : STAR VARIABLE NOT EQUALS VARIABLE',
+    'comparison : STAR VARIABLE BIGGER EQUALS VARIABLE',
+    'comparison : VARIABLE EQUALS EQUALS NULL',
+    'comparison : VARIABLE NOT EQUALS NULL',
+    'comparison : VARIABLE BIGGER EQUALS NULL',
+    'comparison : VARIABLE EQUALS EQUALS VARIABLE',
+    'comparison : VARIABLE NOT EQUALS VARIABLE',
+    'comparison : VARIABLE BIGGER EQUALS VARIABLE',
+    'statement : WHILE LPAREN TRUE RPAREN LBRACE statements RBRACE',
+]
+ACTIONS = [
+    {'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'LPAREN': 12},
+    {'VARIABLE': 13},
+    {'LPAREN': 14},
+    {'STAR': 15},
+    {'LPAREN': 16},
+    {'SEMICOLON': 17},
+    {'$end': -1, 'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'$end': 0},
+    {'$end': -3, 'IF': -3, 'INPUT': -3, 'LPAREN': -3, 'OUTPUT': -3, 'RBRACE': -3, 'STAR': -3, 'VARIABLE': -3, 'WHILE': -3},
+    {'EQUALS': 19, 'MINUS': 21, 'PLUS': 20, 'RPAREN': -7, 'SEMICOLON': -7},
+    {'LPAREN': 22},
+    {'STAR': 23, 'VARIABLE': 25},
+    {'EQUALS': 26, 'RPAREN': -8, 'SEMICOLON': -8},
+    {'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'STAR': 2, 'VARIABLE': 10},
+    {'VARIABLE': 28},
+    {'STAR': 23, 'TRUE': 30, 'VARIABLE': 25},
+    {'$end': -4, 'IF': -4, 'INPUT': -4, 'LPAREN': -4, 'OUTPUT': -4, 'RBRACE': -4, 'STAR': -4, 'VARIABLE': -4, 'WHILE': -4},
+    {'$end': -2, 'IF': -2, 'INPUT': -2, 'LPAREN': -2, 'OUTPUT': -2, 'RBRACE': -2, 'STAR': -2, 'VARIABLE': -2, 'WHILE': -2},
+    {'INPUT': 11, 'LPAREN': 4, 'NULL': 32, 'NUMBER': 31, 'OUTPUT': 3, 'STAR': 2, 'VARIABLE': 10},
+    {'PLUS': 34, 'VARIABLE': 35},
+    {'MINUS': 37, 'VARIABLE': 36},
+    {'RPAREN': 38},
+    {'VARIABLE': 39},
+    {'RPAREN': 40},
+    {'BIGGER': 44, 'EQUALS': 42, 'NOT': 41, 'SMALLER': 43},
+    {'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'STAR': 2, 'VARIABLE': 10},
+    {'RPAREN': 46},
+    {'RPAREN': 47},
+    {'RPAREN': 48},
+    {'RPAREN': 49},
+    {'RPAREN': -15, 'SEMICOLON': -15},
+    {'RPAREN': -16, 'SEMICOLON': -16},
+    {'RPAREN': -18, 'SEMICOLON': -18},
+    {'RPAREN': -9, 'SEMICOLON': -9},
+    {'RPAREN': -13, 'SEMICOLON': -13},
+    {'RPAREN': -14, 'SEMICOLON': -14},
+    {'RPAREN': -11, 'SEMICOLON': -11},
+    {'RPAREN': -5, 'SEMICOLON': -5},
+    {'BIGGER': 53, 'EQUALS': 51, 'NOT': 50, 'SMALLER': 52},
+    {'LBRACE': 54},
+    {'EQUALS': 55},
+    {'EQUALS': 56},
+    {'NULL': 58, 'VARIABLE': 57},
+    {'EQUALS': 59},
+    {'RPAREN': -17, 'SEMICOLON': -17},
+    {'RPAREN': -6, 'SEMICOLON': -6},
+    {'MINUS': 61, 'PLUS': 60},
+    {'LBRACE': 62},
+    {'LBRACE': 63},
+    {'EQUALS': 64},
+    {'EQUALS': 65},
+    {'NULL': 67, 'VARIABLE': 66},
+    {'EQUALS': 68},
+    {'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'NULL': 71, 'VARIABLE': 70},
+    {'NULL': 73, 'VARIABLE': 72},
+    {'RPAREN': -25},
+    {'RPAREN': -24},
+    {'NULL': 75, 'VARIABLE': 74},
+    {'PLUS': 76},
+    {'MINUS': 77},
+    {'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'NULL': 80, 'VARIABLE': 81},
+    {'NULL': 83, 'VARIABLE': 82},
+    {'RPAREN': -23},
+    {'RPAREN': -22},
+    {'NULL': 84, 'VARIABLE': 85},
+    {'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'RBRACE': 86, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'RPAREN': -36},
+    {'RPAREN': -33},
+    {'RPAREN': -35},
+    {'RPAREN': -32},
+    {'RPAREN': -37},
+    {'RPAREN': -34},
+    {'RPAREN': -10, 'SEMICOLON': -10},
+    {'RPAREN': -12, 'SEMICOLON': -12},
+    {'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'RBRACE': 87, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'RBRACE': 88, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'RPAREN': -27},
+    {'RPAREN': -30},
+    {'RPAREN': -29},
+    {'RPAREN': -26},
+    {'RPAREN': -28},
+    {'RPAREN': -31},
+    {'$end': -20, 'ELSE': 89, 'IF': -20, 'INPUT': -20, 'LPAREN': -20, 'OUTPUT': -20, 'RBRACE': -20, 'STAR': -20, 'VARIABLE': -20, 'WHILE': -20},
+    {'$end': -21, 'IF': -21, 'INPUT': -21, 'LPAREN': -21, 'OUTPUT': -21, 'RBRACE': -21, 'STAR': -21, 'VARIABLE': -21, 'WHILE': -21},
+    {'$end': -38, 'IF': -38, 'INPUT': -38, 'LPAREN': -38, 'OUTPUT': -38, 'RBRACE': -38, 'STAR': -38, 'VARIABLE': -38, 'WHILE': -38},
+    {'LBRACE': 90},
+    {'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'IF': 1, 'INPUT': 11, 'LPAREN': 4, 'OUTPUT': 3, 'RBRACE': 92, 'STAR': 2, 'VARIABLE': 10, 'WHILE': 5},
+    {'$end': -19, 'IF': -19, 'INPUT': -19, 'LPAREN': -19, 'OUTPUT': -19, 'RBRACE': -19, 'STAR': -19, 'VARIABLE': -19, 'WHILE': -19},
+]
+GOTOS = [
+    {'expr': 6, 'main': 8, 'statement': 9, 'statements': 7},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {'expr': 6, 'statement': 18},
+    {},
+    {},
+    {},
+    {},
+    {'comparison': 24},
+    {},
+    {'expr': 27},
+    {},
+    {'comparison': 29},
+    {},
+    {},
+    {'expr': 33},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {'expr': 45},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {'expr': 6, 'statement': 9, 'statements': 69},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {'expr': 6, 'statement': 9, 'statements': 78},
+    {'expr': 6, 'statement': 9, 'statements': 79},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {'expr': 6, 'statement': 18},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {'expr': 6, 'statement': 18},
+    {'expr': 6, 'statement': 18},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {},
+    {'expr': 6, 'statement': 9, 'statements': 91},
+    {'expr': 6, 'statement': 18},
+    {},
+]
+DEFAULT_REDUCTIONS = [
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    -3,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    -4,
+    -2,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    -15,
+    -16,
+    -18,
+    -9,
+    -13,
+    -14,
+    -11,
+    -5,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    -17,
+    -6,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    -25,
+    -24,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    -23,
+    -22,
+    0,
+    0,
+    -36,
+    -33,
+    -35,
+    -32,
+    -37,
+    -34,
+    -10,
+    -12,
+    0,
+    0,
+    -27,
+    -30,
+    -29,
+    -26,
+    -28,
+    -31,
+    0,
+    -21,
+    -38,
+    0,
+    0,
+    0,
+    -19,
+]
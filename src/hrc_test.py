@@ -1,4 +1,7 @@
+import io
+import os
 import unittest
+from rply.errors import LexingError, ParsingError
 import hrc
 
 
@@ -124,7 +127,124 @@ class MyTestCase(unittest.TestCase):
         result = hrc.compile("a=0; if (*a != 0) { output(a); }")
         self.assertEqual(["COPYFROM [0]", "JUMPZ A", "COPYFROM 0", "OUTBOX", "A:"], result)
 
-
+    def test_compiler_is_reusable(self):
+        compiler = hrc.Compiler()
+        self.assertEqual(["INBOX", "COPYTO 0"], compiler.compile("x=input();"))
+        self.assertEqual(["INBOX", "OUTBOX"], compiler.compile("output(input());"))
+        self.assertIs(hrc.getCompiler(), hrc.getCompiler())
+
+    def test_statements_in_one_block(self):
+        compiler = hrc.Compiler()
+        block = compiler.parser.parse(compiler.lexer.lex("a=input();" + "output(a);" * 100))
+        self.assertEqual(101, len(block.value))
+
+    def test_more_than_26_labels(self):
+        result = hrc.compile("a=input();" + "if (a != 0) { output(a); }" * 30)
+        self.assertEqual("AD:", result[-1])
+
+    def test_compile_tree_twice(self):
+        compiler = hrc.Compiler()
+        tree = compiler.parse("a=input(); while (a != 0) { output(a); a--; }")
+        first = compiler.compileTree(tree)
+        compiler.compileTree(tree, optimize=True)
+        self.assertEqual(first, compiler.compileTree(tree))
+        self.assertEqual(["A:", "COPYFROM 0", "JUMPZ B", "COPYFROM 0", "OUTBOX", "BUMPDN 0", "JUMP A", "B:"],
+                         first[2:])
+
+    def test_parse_cache(self):
+        compiler = hrc.Compiler(cache_size=2)
+        tree = compiler.parse("output(input());")
+        self.assertIs(tree, compiler.parse("output(input());"))
+        compiler.parse("a=input();")
+        compiler.parse("b=input();")
+        self.assertIsNot(tree, compiler.parse("output(input());"))
+
+    def test_split_statements(self):
+        code = "a=input(); // one; {\nif (a != 0) { output(a); }\n else { a++; } while(true) { a--; }\n// end"
+        for chunk_size in [1, 2, 5, 1000]:
+            self.assertEqual([(hrc.STATEMENT, "a=input();"),
+                              (hrc.STATEMENT, " // one; {\nif (a != 0) { output(a); }\n else { a++; } "),
+                              (hrc.LOOP, "while(true) {"), (hrc.STATEMENT, " a--;"), (hrc.END, " }")],
+                             list(hrc.splitStatements(io.StringIO(code), chunk_size)))
+
+    def test_split_loops(self):
+        # The statements of nested endless loops are split too, the ones of other blocks are not
+        code = "while ( // head\ntrue) { while(true) { if (a != 0) { a--; } }\n while(a != 0) { a--; } }"
+        self.assertEqual([(hrc.LOOP, "while ( // head\ntrue) {"), (hrc.LOOP, " while(true) {"),
+                          (hrc.STATEMENT, " if (a != 0) { a--; } "), (hrc.END, "}"),
+                          (hrc.STATEMENT, "\n while(a != 0) { a--; } "), (hrc.END, "}")],
+                         list(hrc.splitStatements(io.StringIO(code), 3)))
+
+    def test_compile_stream(self):
+        for code in ["a=input(); e=input(); if (a != 0) { output(a); } else { output(e); } while(a < 0) { a++; }",
+                     "a=3; while(true) { b=input(); while(true) { a=b; output(a); if (b == 0) { b++; } } }",
+                     "a=input(); while(true) { output(a); a++; }"]:
+            for chunk_size in [1, 3, 1000]:
+                output = io.StringIO()
+                hrc.Compiler().compileStream(io.StringIO(code), output, chunk_size)
+                self.assertEqual(hrc.compile(code), output.getvalue().splitlines(), code)
+
+    def test_compile_pipe(self):
+        code = "a=input(); while(true) { output(a); }"
+        reader, writer = os.pipe()
+        with os.fdopen(writer, 'w') as f:
+            f.write(code)
+        output = io.StringIO()
+        with os.fdopen(reader, 'r') as f:
+            hrc.Compiler().compileStream(f, output)
+        self.assertEqual(hrc.compile(code), output.getvalue().splitlines())
+
+    def test_compile_stream_error_position(self):
+        code = "a=input();\nif (a != 0) {\n  output(a);\n}\nb=input(); output(a);\noutput(b;\n"
+        with self.assertRaises(ParsingError) as expected:
+            hrc.Compiler().parse(code)
+        for chunk_size in [1, 1000]:
+            with self.assertRaises(ParsingError) as actual:
+                hrc.Compiler().compileStream(io.StringIO(code), io.StringIO(), chunk_size)
+            for position in (expected.exception.getsourcepos(), actual.exception.getsourcepos()):
+                self.assertEqual((70, 6, 9), (position.idx, position.lineno, position.colno))
+
+    def test_loop_errors(self):
+        # The errors within endless loops are found where the parser of the whole program finds them
+        for code in ["a=input(); while(true) {\n}", "while(true) { a=input() }", "while(true) { a=input();",
+                     "while(true) { a=input(); } else { a++; }"]:
+            with self.assertRaises(ParsingError) as expected:
+                hrc.Compiler().parse(code)
+            for chunk_size in [1, 1000]:
+                with self.assertRaises(ParsingError) as actual:
+                    hrc.Compiler().compileStream(io.StringIO(code), io.StringIO(), chunk_size)
+                positions = [error.exception.getsourcepos() for error in (expected, actual)]
+                self.assertEqual(*[(position.idx, position.lineno, position.colno) if position else None
+                                   for position in positions], msg=code)
+
+    def test_tables_match_grammar(self):
+        # Regenerate them with "python hrc.py --write-tables hrc_tables.py" after changing the grammar
+        import hrc_tables
+        self.assertEqual([rule for rule, _ in hrc.PRODUCTIONS], hrc_tables.RULES)
+        self.assertIsInstance(hrc.Compiler().parser, hrc.TableParser)
+
+    def test_lexer_like_rply(self):
+        import hrc_bench
+        lexer = hrc.generateLexer()
+        for name, code in hrc_bench.load_examples():
+            expected = [(t.gettokentype(), t.getstr(), t.getsourcepos().lineno, t.getsourcepos().colno)
+                        for t in lexer.lex(code)]
+            actual = [(t.gettokentype(), t.getstr(), t.getsourcepos().lineno, t.getsourcepos().colno)
+                      for t in hrc.Lexer().lex(code)]
+            self.assertEqual(expected, actual, name)
+        # Like rply, a comment needs its newline
+        self.assertRaises(LexingError, list, hrc.Lexer().lex("a=input(); // no newline"))
+        # The position is printed with the errors
+        from rply.token import SourcePosition
+        self.assertEqual(repr(SourcePosition(44, 6, 10)), repr(hrc.SourcePosition(44, 6, 10)))
+
+    def test_table_parser_like_rply(self):
+        import hrc_bench
+        compiler = hrc.Compiler()
+        parser = hrc.generateParser()
+        for name, code in hrc_bench.load_examples():
+            expected = compiler.compileTree(parser.parse(hrc.generateLexer().lex(code)), optimize=True)
+            self.assertEqual(expected, compiler.compileTree(compiler.parse(code), optimize=True), name)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,104 @@
+from collections import Counter
+import hrir
+
+
+class FloorMap(object):
+    # What the level keeps on the floor, the variables are placed around it
+    def __init__(self, size=None, reserved=(), constants=None):
+        # Number of tiles, None when it is not limited
+        self.size = size
+        # Tiles holding the data of the level, which is only accessed through pointers
+        self.reserved = set(reserved)
+        # Values on the floor when the program starts, variables placed there may read them but not change them
+        self.constants = dict(constants or {})
+
+    def occupied(self):
+        return self.reserved | set(self.constants)
+
+    def check_tile(self, name, tile):
+        if self.size is not None and tile >= self.size:
+            raise Exception("Variable '" + name + "' is placed on tile " + str(tile) + ", but the floor only has " +
+                            str(self.size) + " tiles")
+        if tile in self.reserved:
+            raise Exception("Variable '" + name + "' is placed on tile " + str(tile) + ", which holds data")
+
+
+def parse_range(text):
+    first, _, last = text.partition("-")
+    return range(int(first), int(last or first) + 1)
+
+
+def parse(lines):
+    # One entry per line: "tiles 16", "reserve 0-13" (or a single tile) and "constant 14=0", "#" starts a comment
+    # The simulator and its option parser are only loaded with a floor map, not when starting the compiler
+    from hrsim import parse_value
+    floor_map = FloorMap()
+    for number, line in enumerate(lines, 1):
+        words = line.split("#", 1)[0].split()
+        if not words:
+            continue
+        if len(words) != 2:
+            raise Exception("Line " + str(number) + " of the floor map is not understood: '" + line.strip() + "'")
+        keyword, argument = words
+        if keyword == "tiles":
+            floor_map.size = int(argument)
+        elif keyword == "reserve":
+            floor_map.reserved.update(parse_range(argument))
+        elif keyword == "constant":
+            tile, _, value = argument.partition("=")
+            floor_map.constants[int(tile)] = parse_value(value)
+        else:
+            raise Exception("Line " + str(number) + " of the floor map has the unknown entry '" + keyword + "'")
+    overlap = floor_map.reserved & set(floor_map.constants)
+    if overlap:
+        raise Exception("Tile " + str(min(overlap)) + " is reserved and holds a constant")
+    return floor_map
+
+
+def load(path):
+    with open(path, 'r') as f:
+        return parse(f.readlines())
+
+
+def plan(tree, floor_map=None):
+    uses = Counter()
+    fixed = {}
+    tree.count_variables(uses, fixed)
+    return place(uses, fixed, floor_map)
+
+
+def place(uses, fixed, floor_map=None):
+    # The tiles of the variables which are not placed by the program, uses and fixed are filled by count_variables.
+    # With a floor map the most used variables get the lowest free tiles, without one the variables keep the order
+    # in which they are compiled, the optimizer is tuned to it. The tiles placed by the program, the data and the
+    # constants are left out.
+    by_use = floor_map is not None
+    floor_map = floor_map or FloorMap()
+    for tile, names in sorted(fixed.items()):
+        for name in sorted(names):
+            floor_map.check_tile(name, tile)
+        if by_use and len(names) > 1:
+            raise Exception("Variables '" + "', '".join(sorted(names)) + "' are all placed on tile " + str(tile))
+    taken = set(fixed) | floor_map.occupied()
+    placed = set().union(*fixed.values())
+    positions = {}
+    tile = 0
+    # Sorting is stable, so equally used variables keep the order in which they appear
+    for name in sorted(uses, key=lambda name: -uses[name] if by_use else 0):
+        if name in placed:
+            continue
+        while tile in taken:
+            tile += 1
+        if floor_map.size is not None and tile >= floor_map.size:
+            raise Exception("The floor has no free tile left for variable '" + name + "'")
+        positions[name] = tile
+        tile += 1
+    return positions
+
+
+def check_code(code, floor_map):
+    # The constants must not be overwritten by the program, writes through pointers can not be checked
+    for opcode, operand, indirect, line in code:
+        if opcode in (hrir.COPYTO, hrir.BUMPUP, hrir.BUMPDN) and not indirect and operand in floor_map.constants:
+            raise Exception("Line " + str(line) + ": " + hrir.NAMES[opcode] + " changes the constant " +
+                            str(floor_map.constants[operand]) + " on tile " + str(operand))
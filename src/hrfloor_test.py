@@ -0,0 +1,95 @@
+import glob
+import io
+import os
+import unittest
+import hrast
+import hrc
+import hrc_bench
+import hrfloor
+import hrsim
+
+
+class FloorMapTestCase(unittest.TestCase):
+    def test_parse(self):
+        floor_map = hrfloor.parse(["# level 32", "reserve 0-2", "reserve 5", "", "constant 3=0  # zero",
+                                   "constant 4=A", "tiles 16"])
+        self.assertEqual(set([0, 1, 2, 5]), floor_map.reserved)
+        self.assertEqual({3: 0, 4: "A"}, floor_map.constants)
+        self.assertEqual(16, floor_map.size)
+        self.assertEqual(set([0, 1, 2, 3, 4, 5]), floor_map.occupied())
+
+    def test_parse_errors(self):
+        self.assertRaises(Exception, hrfloor.parse, ["stack 0-3"])
+        self.assertRaises(Exception, hrfloor.parse, ["reserve 0 - 3"])
+        self.assertRaises(Exception, hrfloor.parse, ["reserve 0-3", "constant 2=0"])
+
+    def test_most_used_first(self):
+        tree = hrc.parse("a=input(); b=input(); while(true) { c=input(); output(c+b); }")
+        self.assertEqual({"c": 2, "b": 3, "a": 4}, hrfloor.plan(tree, hrfloor.FloorMap(reserved=[0, 1])))
+        self.assertEqual({"a": 0, "b": 1, "c": 2}, hrfloor.plan(tree))
+
+    def test_around_fixed_variables(self):
+        code = hrc.compile("a=input(); output(a); b=0; b=input(); output(b);")
+        self.assertEqual(["INBOX", "COPYTO 1", "COPYFROM 1", "OUTBOX", "INBOX", "COPYTO 0", "COPYFROM 0", "OUTBOX"],
+                         code)
+
+    def test_order_of_compile(self):
+        # The else branch of "==" is compiled first, so y gets its tile first
+        code = "a=input(); if (a == 0) { x=input(); output(x); } else { y=input(); output(y); }"
+        self.assertEqual({"a": 0, "y": 1, "x": 2}, hrfloor.plan(hrc.parse(code)))
+
+    def test_stream_like_compile(self):
+        floor_map = hrfloor.FloorMap(reserved=[1], constants={3: 0})
+        for code in ["b=input(); a=0; output(b); a=input(); output(b);",
+                     "a=input(); if (a == 0) { x=input(); output(x); } else { y=input(); output(y); }",
+                     "a=input(); b=input(); while(true) { c=input(); output(c); c=2; output(c); }"]:
+            for chunk_size in [1, 1000]:
+                output = io.StringIO()
+                hrc.Compiler().compileStream(io.StringIO(code), output, chunk_size)
+                self.assertEqual(hrc.compile(code), output.getvalue().splitlines(), code)
+                output = io.StringIO()
+                hrc.Compiler().compileStream(io.StringIO(code), output, chunk_size, floor_map)
+                self.assertEqual(hrc.compile(code, floor_map=floor_map), output.getvalue().splitlines(), code)
+
+    def test_overlap(self):
+        floor_map = hrfloor.FloorMap(reserved=range(4), constants={4: 0})
+        self.assertRaises(Exception, hrc.compile, "a=2; output(*a);", floor_map=floor_map)
+        self.assertRaises(Exception, hrc.compile, "a=5; b=5; output(a+b);", floor_map=floor_map)
+        # Without a floor map the program knows what it does
+        self.assertEqual(["COPYFROM 5", "ADD 5", "OUTBOX"], hrc.compile("a=5; b=5; output(a+b);"))
+        self.assertRaises(Exception, hrc.compile, "zero=4; zero=input();", floor_map=floor_map)
+        self.assertRaises(Exception, hrc.compile, "zero=4; zero++;", True, floor_map=floor_map)
+        self.assertEqual(["INBOX", "COPYTO 5", "COPYFROM 5", "ADD 4", "OUTBOX"],
+                         hrc.compile("zero=4; a=input(); output(a+zero);", floor_map=floor_map))
+
+    def test_known_constant(self):
+        # The counted loop is only unrolled when the value of zero is known
+        source = "zero=4; two=zero; two++; two++; a=input(); c=zero; while(c < two) { output(a); c++; }"
+        floor_map = hrfloor.FloorMap(constants={4: 0})
+        self.assertNotIn("JUMP B", hrc.compile(source, True, favor=hrast.SPEED, floor_map=floor_map))
+        self.assertIn("JUMP B", hrc.compile(source, True, favor=hrast.SPEED))
+
+    def test_tile_limit(self):
+        floor_map = hrfloor.FloorMap(size=3, reserved=[0])
+        self.assertRaises(Exception, hrc.compile, "a=input(); b=input(); c=input();", floor_map=floor_map)
+        self.assertRaises(Exception, hrc.compile, "a=3; output(a);", floor_map=floor_map)
+        hrc.compile("a=input(); b=input();", floor_map=floor_map)
+
+    def test_example_maps(self):
+        fixtures = hrc_bench.load_json(hrc_bench.FIXTURES_FILE)
+        paths = sorted(glob.glob(os.path.join(hrc_bench.EXAMPLES_DIR, "*.floor")))
+        self.assertTrue(paths)
+        for path in paths:
+            name = os.path.basename(path)[:-len(".floor")] + ".hc"
+            floor_map = hrfloor.load(path)
+            with open(os.path.join(hrc_bench.EXAMPLES_DIR, name), 'r') as f:
+                tree = hrc.parse(f.read())
+            fixture = fixtures[name]
+            for optimize in (False, True):
+                code = hrc.getCompiler().compileTree(tree, optimize, floor_map=floor_map)
+                result = hrsim.run(code, fixture["inbox"], hrc_bench.fixture_floor(fixture))
+                self.assertEqual(fixture["outbox"], result.outbox, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
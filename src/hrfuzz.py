@@ -0,0 +1,321 @@
+from functools import partial
+from multiprocessing import Pool
+import argparse
+import random
+import re
+import sys
+import time
+
+import hrast
+import hrc
+import hrsim
+
+# The names of the generated variables, every program defines them first, from the inbox or from the floor
+VARIABLES = ["a", "b", "c", "d"]
+# Variables which are defined by their address are placed on tiles which are free otherwise
+FIXED_TILES = range(16, hrsim.FLOOR_SIZE)
+# Deeper derivations end with the productions which need the fewest steps
+MAX_DEPTH = 8
+PROGRAMS = 1000
+INPUTS = 20
+MAX_INBOX = 12
+# Plain code which does not finish within this many steps is not compared, the optimized code gets twice as many
+MAX_STEPS = 2000
+FAVORS = [hrast.SIZE, hrast.SPEED]
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# The tokens which end a line, to keep the programs readable
+LINE_ENDS = ("SEMICOLON", "LBRACE", "RBRACE")
+
+
+def grammar():
+    # The productions of the parser by their nonterminal, each one as list of symbols
+    rules = {}
+    for rule, _ in hrc.PRODUCTIONS:
+        name, symbols = rule.split(":")
+        rules.setdefault(name.strip(), []).append(symbols.split())
+    return rules
+
+
+def heights(rules):
+    # The least depth of a derivation of every nonterminal
+    height = {}
+    changed = True
+    while changed:
+        changed = False
+        for name, productions in rules.items():
+            for production in productions:
+                if all(symbol in height or symbol not in rules for symbol in production):
+                    value = 1 + max([height.get(symbol, 0) for symbol in production])
+                    if value < height.get(name, value + 1):
+                        height[name] = value
+                        changed = True
+    return height
+
+
+RULES = grammar()
+HEIGHTS = heights(RULES)
+# The text of the tokens which only match one text
+LEXEMES = dict((name, re.sub(r"\\(.)", r"\1", pattern)) for name, pattern in hrc.TOKENS)
+
+
+def production_height(production):
+    return 1 + max([HEIGHTS.get(symbol, 0) for symbol in production])
+
+
+def lexeme(rng, symbol):
+    if symbol == "VARIABLE":
+        return rng.choice(VARIABLES)
+    if symbol == "NUMBER":
+        return str(rng.choice(FIXED_TILES))
+    return LEXEMES[symbol]
+
+
+def generate(rng, symbol, max_depth=MAX_DEPTH, depth=0):
+    # A random derivation of symbol as (symbol, children), a token is (symbol, text)
+    if symbol not in RULES:
+        return symbol, lexeme(rng, symbol)
+    productions = RULES[symbol]
+    if depth >= max_depth:
+        least = min(production_height(production) for production in productions)
+        productions = [production for production in productions if production_height(production) == least]
+    production = rng.choice(productions)
+    return symbol, tuple(generate(rng, child, max_depth, depth + 1) for child in production)
+
+
+def shortest(symbol):
+    # The derivation of symbol with the fewest tokens
+    if symbol not in RULES:
+        return symbol, {"VARIABLE": VARIABLES[0], "NUMBER": str(FIXED_TILES[0])}.get(symbol, LEXEMES.get(symbol))
+    production = min(RULES[symbol], key=lambda production: (production_height(production), len(production)))
+    return symbol, tuple(shortest(child) for child in production)
+
+
+def generate_program(rng, max_depth=MAX_DEPTH):
+    # Returns the statements defining the variables and the tree of the random statements using them
+    tiles = rng.sample(list(FIXED_TILES), len(VARIABLES))
+    preamble = tuple("%s=input();" % name if rng.random() < 0.5 else "%s=%d;" % (name, tile)
+                     for name, tile in zip(VARIABLES, tiles))
+    return preamble, generate(rng, "main", max_depth)
+
+
+def tokens(tree):
+    symbol, value = tree
+    if symbol not in RULES:
+        return [(symbol, value)]
+    return [token for child in value for token in tokens(child)]
+
+
+def source(program):
+    preamble, tree = program
+    text = "".join(line + "\n" for line in preamble)
+    for symbol, value in tokens(tree):
+        # Two words would be read as one without a space
+        if text[-1:].isalnum() and value[0].isalnum():
+            text += " "
+        text += value + ("\n" if symbol in LINE_ENDS else "")
+    return text
+
+
+def random_value(rng):
+    choice = rng.random()
+    if choice < 0.05:
+        return rng.choice(LETTERS)
+    if choice < 0.1:
+        return rng.choice([-999, 999])
+    # Mostly tile numbers, so pointers point to the floor
+    return rng.randint(-9, hrsim.FLOOR_SIZE - 1)
+
+
+def random_input(rng):
+    inbox = [random_value(rng) for _ in range(rng.randint(0, MAX_INBOX))]
+    floor = dict((tile, rng.randint(-9, hrsim.FLOOR_SIZE - 1)) for tile in range(hrsim.FLOOR_SIZE)
+                 if rng.random() < 0.8)
+    return inbox, floor
+
+
+def compile_variants(text):
+    # The plain program and the optimized ones by favor, an optimization which fails gives its exception
+    compiler = hrc.getCompiler()
+    tree = compiler.parse(text)
+    plain = hrsim.Program(compiler.compileIR(tree))
+    optimized = []
+    for favor in FAVORS:
+        try:
+            optimized.append((favor, hrsim.Program(compiler.compileIR(tree, True, favor=favor))))
+        except Exception as e:
+            optimized.append((favor, e))
+    return plain, optimized
+
+
+def expected_outbox(plain, inbox, floor):
+    # None when the plain code fails, the game would fail as well, so the optimized code may do anything
+    try:
+        return plain.run(inbox, dict(floor), max_steps=MAX_STEPS).outbox
+    except hrsim.SimulationError:
+        return None
+
+
+def compare(optimized, inbox, floor, expected):
+    # Describes how the optimized code differs from the plain one, None when it does not
+    for favor, program in optimized:
+        if isinstance(program, Exception):
+            return "-O --favor=%s does not compile: %s" % (favor, program)
+        try:
+            outbox = program.run(inbox, dict(floor), max_steps=2 * MAX_STEPS).outbox
+        except hrsim.SimulationError as e:
+            return "-O --favor=%s fails: %s, the plain code outputs %s" % (favor, e, expected)
+        if outbox != expected:
+            return "-O --favor=%s outputs %s instead of %s" % (favor, outbox, expected)
+    return None
+
+
+def mismatch(program, inbox, floor):
+    try:
+        plain, optimized = compile_variants(source(program))
+    except Exception:
+        return None
+    expected = expected_outbox(plain, inbox, floor)
+    if expected is None:
+        return None
+    return compare(optimized, inbox, floor, expected)
+
+
+def replace(tree, path, subtree):
+    if not path:
+        return subtree
+    symbol, children = tree
+    index = path[0]
+    return symbol, children[:index] + (replace(children[index], path[1:], subtree),) + children[index + 1:]
+
+
+def subtrees(tree, path=()):
+    # Every nonterminal of the tree with its path, the outer ones first
+    symbol, value = tree
+    if symbol not in RULES:
+        return
+    yield path, tree
+    for index, child in enumerate(value):
+        for found in subtrees(child, path + (index,)):
+            yield found
+
+
+def smaller_trees(tree):
+    # A node is replaced by a node of the same symbol below it, by a node below it which derives from its symbol
+    # in one step, or by the shortest derivation of its symbol. This drops statements of a list, unwraps the
+    # bodies of if and while and simplifies the expressions.
+    size = len(tokens(tree))
+    for path, node in subtrees(tree):
+        symbol = node[0]
+        units = [production[0] for production in RULES[symbol] if len(production) == 1 and production[0] in RULES]
+        candidates = [shortest(symbol)]
+        for _, inner in subtrees(node):
+            if inner is not node and inner[0] == symbol:
+                candidates.append(inner)
+            elif inner[0] in units:
+                candidates.append((symbol, (inner,)))
+        for candidate in sorted(candidates, key=lambda candidate: len(tokens(candidate))):
+            smaller = replace(tree, path, candidate)
+            if len(tokens(smaller)) < size:
+                yield smaller
+
+
+def smaller_inputs(inbox, floor):
+    for i in range(len(inbox)):
+        yield inbox[:i] + inbox[i + 1:], floor
+    for i, value in enumerate(inbox):
+        if value != 0:
+            yield inbox[:i] + [0] + inbox[i + 1:], floor
+    for tile in sorted(floor):
+        yield inbox, dict((other, value) for other, value in floor.items() if other != tile)
+
+
+def shrink(program, inbox, floor, fails):
+    # Makes the program and its input smaller as long as fails(program, inbox, floor) stays true
+    changed = True
+    while changed:
+        changed = False
+        preamble, tree = program
+        candidates = [(preamble[:i] + preamble[i + 1:], tree) for i in range(len(preamble))]
+        candidates.extend((preamble, smaller) for smaller in smaller_trees(tree))
+        for candidate in candidates:
+            if fails(candidate, inbox, floor):
+                program = candidate
+                changed = True
+                break
+        if changed:
+            continue
+        for smaller_inbox, smaller_floor in smaller_inputs(inbox, floor):
+            if fails(program, smaller_inbox, smaller_floor):
+                inbox, floor = smaller_inbox, smaller_floor
+                changed = True
+                break
+    return program, inbox, floor
+
+
+def fails(program, inbox, floor):
+    return mismatch(program, inbox, floor) is not None
+
+
+def fuzz_program(index, seed=0, inputs=INPUTS, max_depth=MAX_DEPTH):
+    # Runs within the worker processes. Returns the index, whether the program compiles, the number of inputs on
+    # which the plain code works and the shrunk mismatch, if there is one.
+    rng = random.Random("%d-%d" % (seed, index))
+    program = generate_program(rng, max_depth)
+    try:
+        plain, optimized = compile_variants(source(program))
+    except Exception:
+        return index, False, 0, None
+    checked = 0
+    for _ in range(inputs):
+        inbox, floor = random_input(rng)
+        expected = expected_outbox(plain, inbox, floor)
+        if expected is None:
+            continue
+        checked += 1
+        if compare(optimized, inbox, floor, expected) is not None:
+            program, inbox, floor = shrink(program, inbox, floor, fails)
+            return index, True, checked, (source(program), inbox, floor, mismatch(program, inbox, floor))
+    return index, True, checked, None
+
+
+def fuzz(programs=PROGRAMS, seed=0, inputs=INPUTS, max_depth=MAX_DEPTH, jobs=None):
+    # Returns the result of fuzz_program for every program, ordered by the index
+    function = partial(fuzz_program, seed=seed, inputs=inputs, max_depth=max_depth)
+    if jobs == 1:
+        return [function(index) for index in range(programs)]
+    # Build the lexer and parser before forking, so the workers do not have to
+    hrc.getCompiler()
+    with Pool(jobs, initializer=hrc.getCompiler) as pool:
+        return sorted(pool.imap_unordered(function, range(programs), chunksize=16))
+
+
+def print_summary(results, seconds):
+    compiled = len([result for result in results if result[1]])
+    checked = sum(result[2] for result in results)
+    failures = [result for result in results if result[3] is not None]
+    for index, _, _, (text, inbox, floor, problem) in failures:
+        print("program %d: %s" % (index, problem))
+        print("    inbox %s, floor %s" % (inbox, floor))
+        for line in text.splitlines():
+            print("    " + line)
+    print("%d programs, %d compiled, %d inputs compared, %d mismatches in %.1f s, %.0f programs/s" % (
+        len(results), compiled, checked, len(failures), seconds, len(results) / seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--programs", type=int, default=PROGRAMS, help="Number of programs to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generator, the programs depend on it")
+    parser.add_argument("--inputs", type=int, default=INPUTS, help="Number of random inputs per program")
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH, help="Depth of the derivations of the grammar")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    results = fuzz(args.programs, args.seed, args.inputs, args.max_depth, args.jobs)
+    print_summary(results, time.perf_counter() - start)
+    if any(result[3] is not None for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
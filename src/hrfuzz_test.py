@@ -0,0 +1,54 @@
+import random
+import unittest
+import hrc
+import hrfuzz
+import hrsim
+
+
+class FuzzTestCase(unittest.TestCase):
+    def test_programs_parse(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            program = hrfuzz.generate_program(rng)
+            hrc.parse(hrfuzz.source(program))
+
+    def test_grammar_heights(self):
+        self.assertEqual(1, hrfuzz.HEIGHTS["expr"])
+        self.assertEqual(4, hrfuzz.HEIGHTS["main"])
+        self.assertIn(["VARIABLE", "EQUALS", "NUMBER"], hrfuzz.RULES["expr"])
+
+    def test_shortest_derivation(self):
+        self.assertEqual([("VARIABLE", "a"), ("SEMICOLON", ";")], hrfuzz.tokens(hrfuzz.shortest("statement")))
+
+    def test_compare(self):
+        optimized = [("size", hrsim.Program(["INBOX", "OUTBOX"]))]
+        self.assertIsNone(hrfuzz.compare(optimized, [2], {}, [2]))
+        self.assertEqual("-O --favor=size outputs [2] instead of [3]", hrfuzz.compare(optimized, [2], {}, [3]))
+        self.assertIn("fails", hrfuzz.compare([("speed", hrsim.Program(["OUTBOX"]))], [], {}, []))
+
+    def test_shrink(self):
+        # Shrinks as long as the program outputs something
+        rng = random.Random(1)
+        program = hrfuzz.generate_program(rng)
+        while "output" not in hrfuzz.source(program):
+            program = hrfuzz.generate_program(rng)
+
+        def fails(candidate, inbox, floor):
+            return "output" in hrfuzz.source(candidate)
+
+        program, inbox, floor = hrfuzz.shrink(program, [1, 2], {0: 5}, fails)
+        self.assertEqual((), program[0])
+        self.assertEqual(["OUTPUT", "LPAREN", "VARIABLE", "RPAREN", "SEMICOLON"],
+                         [symbol for symbol, _ in hrfuzz.tokens(program[1])])
+        self.assertEqual(([], {}), (inbox, floor))
+
+    def test_fuzz(self):
+        results = hrfuzz.fuzz(20, seed=1, jobs=1)
+        self.assertEqual(list(range(20)), [result[0] for result in results])
+        self.assertTrue(sum(result[2] for result in results) > 0)
+        self.assertEqual([], [result[3] for result in results if result[3] is not None])
+        self.assertEqual(results[5], hrfuzz.fuzz_program(5, seed=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
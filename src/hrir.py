@@ -0,0 +1,124 @@
+from array import array
+
+# The values the boxes can hold, besides letters
+MIN_VALUE = -999
+MAX_VALUE = 999
+INBOX, OUTBOX, COPYFROM, COPYTO, ADD, SUB, BUMPUP, BUMPDN, JUMP, JUMPZ, JUMPN, LABEL = range(12)
+NAMES = ["INBOX", "OUTBOX", "COPYFROM", "COPYTO", "ADD", "SUB", "BUMPUP", "BUMPDN", "JUMP", "JUMPZ", "JUMPN"]
+OPCODES = dict((name, opcode) for opcode, name in enumerate(NAMES))
+JUMPS = (JUMP, JUMPZ, JUMPN)
+TILE_COMMANDS = (COPYFROM, COPYTO, ADD, SUB, BUMPUP, BUMPDN)
+LABEL_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def label_name(index):
+    # 0 -> A, 25 -> Z, 26 -> AA, 27 -> AB, ...
+    name = ""
+    index += 1
+    while index > 0:
+        index, letter = divmod(index - 1, len(LABEL_LETTERS))
+        name = LABEL_LETTERS[letter] + name
+    return name
+
+
+def label_index(name):
+    # The reverse of label_name
+    index = 0
+    for letter in name:
+        index = index * len(LABEL_LETTERS) + LABEL_LETTERS.index(letter) + 1
+    return index - 1
+
+
+class Code(object):
+    # The instructions as parallel arrays: opcode, operand (floor tile or label id), the indirect flag and the
+    # source line the instruction was compiled from, 0 when it is not known
+    __slots__ = ("opcodes", "operands", "indirect", "lines", "line")
+
+    def __init__(self, instructions=()):
+        self.opcodes = array('b')
+        self.operands = array('i')
+        self.indirect = array('b')
+        self.lines = array('i')
+        # The line of the statement which is compiled at the moment
+        self.line = 0
+        for instruction in instructions:
+            self.append(*instruction)
+
+    def append(self, opcode, operand=0, indirect=False, line=None):
+        self.opcodes.append(opcode)
+        self.operands.append(operand)
+        self.indirect.append(1 if indirect else 0)
+        self.lines.append(self.line if line is None else line)
+
+    def clear(self):
+        del self.opcodes[:]
+        del self.operands[:]
+        del self.indirect[:]
+        del self.lines[:]
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __getitem__(self, i):
+        return self.opcodes[i], self.operands[i], self.indirect[i] == 1, self.lines[i]
+
+    def __iter__(self):
+        for i in range(len(self.opcodes)):
+            yield self.opcodes[i], self.operands[i], self.indirect[i] == 1, self.lines[i]
+
+    def __eq__(self, other):
+        # The source lines do not change what the code does
+        if not isinstance(other, Code):
+            return False
+        return (self.opcodes, self.operands, self.indirect) == (other.opcodes, other.operands, other.indirect)
+
+    def size(self):
+        return len(self.opcodes) - self.opcodes.count(LABEL)
+
+    def format(self):
+        return [format_instruction(instruction) for instruction in self]
+
+
+def format_instruction(instruction):
+    opcode, operand, indirect, _ = instruction
+    if opcode == LABEL:
+        return label_name(operand) + ":"
+    if opcode in JUMPS:
+        return NAMES[opcode] + " " + label_name(operand)
+    if opcode == INBOX or opcode == OUTBOX:
+        return NAMES[opcode]
+    if indirect:
+        return NAMES[opcode] + " [" + str(operand) + "]"
+    return NAMES[opcode] + " " + str(operand)
+
+
+def parse(lines):
+    # The reverse of Code.format, labels which are not made of capital letters get unused ids
+    names = {}
+    for line in lines:
+        if line.endswith(":") and line[:-1].isalpha() and line[:-1].isupper():
+            names[line[:-1]] = label_index(line[:-1])
+    code = Code()
+    for line in lines:
+        if line.endswith(":"):
+            code.append(LABEL, label_id(names, line[:-1]))
+            continue
+        parts = line.split(" ", 1)
+        if parts[0] not in OPCODES:
+            raise Exception("Unknown instruction '" + line + "'")
+        opcode = OPCODES[parts[0]]
+        if len(parts) == 1:
+            code.append(opcode)
+        elif opcode in JUMPS:
+            code.append(opcode, label_id(names, parts[1]))
+        elif parts[1].startswith("["):
+            code.append(opcode, int(parts[1][1:-1]), True)
+        else:
+            code.append(opcode, int(parts[1]))
+    return code
+
+
+def label_id(names, name):
+    if name not in names:
+        names[name] = max(list(names.values()) + [-1]) + 1
+    return names[name]
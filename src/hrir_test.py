@@ -0,0 +1,54 @@
+import unittest
+import hrc
+import hrir
+
+
+class IRTestCase(unittest.TestCase):
+    def test_parse_format(self):
+        lines = ["A:", "INBOX", "COPYTO 3", "COPYFROM [2]", "JUMPZ AB", "AB:", "OUTBOX", "JUMP A"]
+        self.assertEqual(lines, hrir.parse(lines).format())
+
+    def test_instructions(self):
+        code = hrir.Code()
+        code.append(hrir.LABEL, 27)
+        code.line = 3
+        code.append(hrir.BUMPUP, 4, True)
+        code.append(hrir.JUMP, 27, line=5)
+        self.assertEqual([(hrir.LABEL, 27, False, 0), (hrir.BUMPUP, 4, True, 3), (hrir.JUMP, 27, False, 5)],
+                         list(code))
+        self.assertEqual(["AB:", "BUMPUP [4]", "JUMP AB"], code.format())
+        self.assertEqual(2, code.size())
+        self.assertEqual(code, hrir.Code(list(code)))
+        code.clear()
+        self.assertEqual(0, len(code))
+
+    def test_label_name(self):
+        self.assertEqual(["A", "Z", "AA", "AZ", "BA", "ZZ", "AAA"],
+                         [hrir.label_name(index) for index in [0, 25, 26, 51, 52, 701, 702]])
+        self.assertEqual([0, 25, 26, 51, 52, 701, 702],
+                         [hrir.label_index(name) for name in ["A", "Z", "AA", "AZ", "BA", "ZZ", "AAA"]])
+
+    def test_compile_to_ir(self):
+        compiler = hrc.getCompiler()
+        code = compiler.compileIR(compiler.parse("while(true) { output(input()); }"))
+        self.assertEqual([(hrir.LABEL, 0, False, 1), (hrir.INBOX, 0, False, 1), (hrir.OUTBOX, 0, False, 1),
+                          (hrir.JUMP, 0, False, 1)], list(code))
+
+    def test_source_lines(self):
+        compiler = hrc.getCompiler()
+        tree = compiler.parse("a=input();\nwhile (a != 0) {\n  output(a);\n  a=input();\n}\noutput(a);")
+        code = compiler.compileIR(tree)
+        self.assertEqual(["INBOX", "COPYTO 0", "A:", "COPYFROM 0", "JUMPZ B", "COPYFROM 0", "OUTBOX", "INBOX",
+                          "COPYTO 0", "JUMP A", "B:", "COPYFROM 0", "OUTBOX"], code.format())
+        self.assertEqual([1, 1, 2, 2, 2, 3, 3, 4, 4, 2, 2, 6, 6], list(code.lines))
+        code = compiler.compileIR(tree, optimize=True)
+        # The input at the end of the loop is merged with the one in front of it, it keeps the line of the first one
+        self.assertEqual(["A:", "INBOX", "JUMPZ B", "OUTBOX", "JUMP A", "B:", "OUTBOX"], code.format())
+        self.assertEqual([1, 1, 2, 3, 2, 2, 6], list(code.lines))
+
+    def test_unknown_instruction(self):
+        self.assertRaises(Exception, hrir.parse, ["JUMPP A"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,754 @@
+import hrir
+import hrsim
+from hrir import INBOX, OUTBOX, COPYFROM, COPYTO, ADD, SUB, BUMPUP, BUMPDN, JUMP, JUMPZ, JUMPN, LABEL, JUMPS, \
+    TILE_COMMANDS, MIN_VALUE, MAX_VALUE
+
+ANY_TILE = -1
+# Loop heads are widened to the full value range after this many changes, so the analysis terminates
+WIDEN_AFTER = 3
+# A sample which takes more steps is left out of the profile, so a sample which never ends costs little compile time
+PROFILE_STEPS = 20000
+
+
+def label_positions(code):
+    return {argument: i for i, (command, argument, _, _) in enumerate(code) if command == LABEL}
+
+
+def rename_jumps(code, mapping):
+    return [(command, mapping.get(argument, argument), indirect, line) if command in JUMPS
+            else (command, argument, indirect, line) for command, argument, indirect, line in code]
+
+
+def merge_labels(code):
+    # Labels directly following each other point to the same instruction, only the first one is kept
+    mapping = {}
+    result = []
+    for instruction in code:
+        if instruction[0] == LABEL and result and result[-1][0] == LABEL:
+            mapping[instruction[1]] = result[-1][1]
+            continue
+        result.append(instruction)
+    return rename_jumps(result, mapping)
+
+
+def rename_labels(code):
+    # Number the remaining labels again, so labels removed by the optimization are reused
+    mapping = {}
+    for command, argument, _, _ in code:
+        if command == LABEL:
+            mapping[argument] = len(mapping)
+    return [(command, mapping[argument], indirect, line) if command == LABEL else (command, argument, indirect, line)
+            for command, argument, indirect, line in rename_jumps(code, mapping)]
+
+
+def successors(code, labels, i):
+    command, argument, _, _ = code[i]
+    targets = []
+    if command in JUMPS:
+        targets.append(labels[argument])
+    if command != JUMP and i + 1 < len(code):
+        targets.append(i + 1)
+    return targets
+
+
+def transfer(state, instruction):
+    # The state is the set of floor tiles which hold the same value as the accumulator
+    command, argument, indirect, _ = instruction
+    if command == COPYFROM:
+        if indirect:
+            return frozenset()
+        if argument in state:
+            return state
+        return frozenset([argument])
+    if command == COPYTO:
+        if indirect:
+            return state
+        return state | frozenset([argument])
+    if command == BUMPUP or command == BUMPDN:
+        if indirect:
+            return frozenset()
+        return frozenset([argument])
+    if command in (INBOX, OUTBOX, ADD, SUB):
+        return frozenset()
+    return state
+
+
+def accumulator_states(code):
+    # Forward data flow analysis, None marks instructions which are never reached
+    labels = label_positions(code)
+    states = [None] * len(code)
+    if not code:
+        return states
+    states[0] = frozenset()
+    worklist = [0]
+    while worklist:
+        i = worklist.pop()
+        state = transfer(states[i], code[i])
+        for target in successors(code, labels, i):
+            if states[target] is None:
+                new_state = state
+            else:
+                new_state = states[target] & state
+            if new_state != states[target]:
+                states[target] = new_state
+                worklist.append(target)
+    return states
+
+
+def remove_redundant_moves(code):
+    states = accumulator_states(code)
+    result = []
+    for state, instruction in zip(states, code):
+        command, argument, indirect, _ = instruction
+        if state is None:
+            # Unreachable code
+            continue
+        if command in (COPYFROM, COPYTO) and not indirect and argument in state:
+            # The accumulator or the floor tile already holds the value
+            continue
+        result.append(instruction)
+    return result
+
+
+def remove_dead_loads(code):
+    # A value loaded into the accumulator which is replaced by the next instruction is never used
+    result = []
+    for instruction in code:
+        if instruction[0] in (COPYFROM, INBOX) and result and result[-1][0] in (COPYFROM, ADD, SUB):
+            result.pop()
+        result.append(instruction)
+    return result
+
+
+def remove_jumps_to_next(code):
+    result = []
+    for i, instruction in enumerate(code):
+        command, argument, _, _ = instruction
+        if command in JUMPS:
+            following = i + 1
+            while following < len(code) and code[following][0] == LABEL:
+                if code[following][1] == argument:
+                    break
+                following += 1
+            if following < len(code) and code[following][:2] == (LABEL, argument):
+                continue
+        result.append(instruction)
+    return result
+
+
+def remove_unused_labels(code):
+    used = set(argument for command, argument, _, _ in code if command in JUMPS)
+    return [instruction for instruction in code if instruction[0] != LABEL or instruction[1] in used]
+
+
+def uses_and_definitions(instruction):
+    # ANY_TILE stands for the tile an indirect read may touch
+    command, argument, indirect, _ = instruction
+    if command in (COPYFROM, ADD, SUB, BUMPUP, BUMPDN):
+        if indirect:
+            return frozenset([argument, ANY_TILE]), frozenset()
+        if command == BUMPUP or command == BUMPDN:
+            return frozenset([argument]), frozenset([argument])
+        return frozenset([argument]), frozenset()
+    if command == COPYTO:
+        if indirect:
+            return frozenset([argument]), frozenset()
+        return frozenset(), frozenset([argument])
+    return frozenset(), frozenset()
+
+
+def live_tiles(code):
+    # Backward data flow analysis, returns the tiles which are read later on after each instruction
+    labels = label_positions(code)
+    targets = [successors(code, labels, i) for i in range(len(code))]
+    predecessors = [[] for _ in code]
+    for i in range(len(code)):
+        for target in targets[i]:
+            predecessors[target].append(i)
+    effects = [uses_and_definitions(instruction) for instruction in code]
+    live_in = [frozenset() for _ in code]
+    live_out = [frozenset() for _ in code]
+    worklist = list(range(len(code)))
+    while worklist:
+        i = worklist.pop()
+        live = frozenset().union(*[live_in[target] for target in targets[i]])
+        live_out[i] = live
+        uses, definitions = effects[i]
+        live = uses | (live - definitions)
+        if live != live_in[i]:
+            live_in[i] = live
+            worklist.extend(predecessors[i])
+    return live_in, live_out
+
+
+def remove_dead_stores(code):
+    _, live_out = live_tiles(code)
+    result = []
+    for live, instruction in zip(live_out, code):
+        command, argument, indirect, _ = instruction
+        if command == COPYTO and not indirect and argument not in live and ANY_TILE not in live:
+            continue
+        result.append(instruction)
+    return result
+
+
+def reuse_floor_tiles(code, fixed_positions):
+    # Tiles whose values are never alive at the same time share one floor position (greedy graph coloring)
+    if any(indirect for _, _, indirect, _ in code):
+        # Pointer arithmetic depends on the layout of the floor
+        return code
+    live_in, live_out = live_tiles(code)
+    tiles = set(argument for command, argument, _, _ in code if command in TILE_COMMANDS)
+    pinned = set(fixed_positions)
+    if code:
+        # Tiles which are read before they are written hold values of the level
+        pinned |= live_in[0]
+    interference = dict((tile, set()) for tile in tiles)
+    for live, instruction in zip(live_out, code):
+        _, definitions = uses_and_definitions(instruction)
+        for defined in definitions:
+            for tile in live:
+                if tile != defined:
+                    interference[defined].add(tile)
+                    interference[tile].add(defined)
+    mapping = {}
+    for tile in sorted(tiles):
+        if tile in pinned:
+            mapping[tile] = tile
+            continue
+        taken = set(mapping[neighbour] for neighbour in interference[tile] if neighbour in mapping)
+        position = 0
+        while position in taken or position in pinned:
+            position += 1
+        mapping[tile] = position
+    return [(command, mapping[argument], indirect, line) if command in TILE_COMMANDS
+            else (command, argument, indirect, line) for command, argument, indirect, line in code]
+
+
+def value_range(low, high):
+    return max(low, MIN_VALUE), min(high, MAX_VALUE)
+
+
+def combine_ranges(command, left, right):
+    # None stands for an unknown value, which might be a letter as well
+    if left is None or right is None:
+        return None
+    if command == ADD:
+        return value_range(left[0] + right[0], left[1] + right[1])
+    return value_range(left[0] - right[1], left[1] - right[0])
+
+
+class ValueState(object):
+    def __init__(self, accumulator=None, tiles=None, same=frozenset()):
+        # Range of the accumulator, ranges of the floor tiles and the tiles equal to the accumulator
+        self.accumulator = accumulator
+        self.tiles = tiles if tiles is not None else {}
+        self.same = same
+
+    def __eq__(self, other):
+        if not isinstance(other, ValueState):
+            return False
+        return (self.accumulator, self.tiles, self.same) == (other.accumulator, other.tiles, other.same)
+
+    def join(self, other, widen=False):
+        accumulator = join_ranges(self.accumulator, other.accumulator, widen)
+        tiles = {}
+        for tile, value in self.tiles.items():
+            if tile in other.tiles:
+                joined = join_ranges(value, other.tiles[tile], widen)
+                if joined is not None:
+                    tiles[tile] = joined
+        return ValueState(accumulator, tiles, self.same & other.same)
+
+    def transfer(self, instruction):
+        command, argument, indirect, _ = instruction
+        accumulator = None
+        tiles = self.tiles
+        if command == COPYFROM and not indirect:
+            accumulator = tiles.get(argument)
+        elif command == COPYTO:
+            accumulator = self.accumulator
+            tiles = dict(tiles)
+            if indirect:
+                tiles = {}
+            elif accumulator is None:
+                tiles.pop(argument, None)
+            else:
+                tiles[argument] = accumulator
+        elif (command == ADD or command == SUB) and not indirect:
+            if command == SUB and argument in self.same:
+                accumulator = (0, 0)
+            else:
+                accumulator = combine_ranges(command, self.accumulator, tiles.get(argument))
+        elif command == BUMPUP or command == BUMPDN:
+            tiles = dict(tiles)
+            if indirect:
+                tiles = {}
+            elif argument in tiles:
+                step = (1, 1) if command == BUMPUP else (-1, -1)
+                accumulator = combine_ranges(ADD, tiles[argument], step)
+                tiles[argument] = accumulator
+        elif command == LABEL or command in JUMPS:
+            accumulator = self.accumulator
+        return ValueState(accumulator, tiles, transfer(self.same, instruction))
+
+
+def join_ranges(left, right, widen):
+    if left is None or right is None:
+        return None
+    low = min(left[0], right[0])
+    high = max(left[1], right[1])
+    if widen:
+        if low < left[0]:
+            low = MIN_VALUE
+        if high > left[1]:
+            high = MAX_VALUE
+    return low, high
+
+
+def value_states(code):
+    # Forward data flow analysis of the value ranges, None marks instructions which are never reached
+    labels = label_positions(code)
+    states = [None] * len(code)
+    if not code:
+        return states
+    changes = [0] * len(code)
+    states[0] = ValueState()
+    worklist = [0]
+    while worklist:
+        i = worklist.pop()
+        state = states[i].transfer(code[i])
+        for target in successors(code, labels, i):
+            if states[target] is None:
+                new_state = state
+            else:
+                new_state = states[target].join(state, changes[target] >= WIDEN_AFTER)
+            if new_state != states[target]:
+                states[target] = new_state
+                changes[target] += 1
+                worklist.append(target)
+    return states
+
+
+def fold_constants(code):
+    states = value_states(code)
+    result = []
+    for state, instruction in zip(states, code):
+        command, argument, indirect, line = instruction
+        if state is None:
+            result.append(instruction)
+            continue
+        accumulator = state.accumulator
+        if (command == ADD or command == SUB) and not indirect and state.tiles.get(argument) == (0, 0):
+            # Adding or subtracting a tile which is known to be zero
+            continue
+        if command == JUMPZ and accumulator is not None:
+            if accumulator == (0, 0):
+                result.append((JUMP, argument, False, line))
+            elif accumulator[0] <= 0 <= accumulator[1]:
+                result.append(instruction)
+            # Otherwise the jump is never taken
+            continue
+        if command == JUMPN and accumulator is not None:
+            if accumulator[1] < 0:
+                result.append((JUMP, argument, False, line))
+            elif accumulator[0] < 0:
+                result.append(instruction)
+            continue
+        result.append(instruction)
+    return result
+
+
+class ValueNumbering(object):
+    # Equal values get equal numbers: what the accumulator and the floor tiles hold within one basic block
+    def __init__(self):
+        # Numbers by expression, an expression is an opcode with the numbers of its operands
+        self.values = {}
+        self.reset()
+
+    def reset(self):
+        self.accumulator = None
+        self.tiles = {}
+
+    def number(self, key):
+        if key not in self.values:
+            self.values[key] = len(self.values)
+        return self.values[key]
+
+    def unknown(self):
+        return self.number(("unknown", len(self.values)))
+
+    def tile(self, tile):
+        # A tile which is read before it is written within the block holds some value from before
+        if tile not in self.tiles:
+            self.tiles[tile] = self.unknown()
+        return self.tiles[tile]
+
+    def expression(self, command, left, right):
+        if command == SUB and left == right:
+            # Holds for letters as well
+            return ("zero",)
+        if command == ADD:
+            return command, min(left, right), max(left, right)
+        return command, left, right
+
+    def holder(self, value):
+        tiles = [tile for tile, held in self.tiles.items() if held == value]
+        return min(tiles) if tiles else None
+
+    def transfer(self, instruction):
+        command, argument, indirect, _ = instruction
+        if command == LABEL or command == JUMP:
+            self.reset()
+        elif command == INBOX:
+            self.accumulator = self.unknown()
+        elif command == OUTBOX:
+            self.accumulator = None
+        elif indirect:
+            if command != COPYFROM and command != ADD and command != SUB:
+                self.tiles = {}
+            if command != COPYTO:
+                self.accumulator = self.unknown()
+        elif command == COPYFROM:
+            self.accumulator = self.tile(argument)
+        elif command == COPYTO:
+            if self.accumulator is None:
+                self.accumulator = self.unknown()
+            self.tiles[argument] = self.accumulator
+        elif command == ADD or command == SUB:
+            if self.accumulator is None:
+                self.accumulator = self.unknown()
+            self.accumulator = self.number(self.expression(command, self.accumulator, self.tile(argument)))
+        elif command == BUMPUP or command == BUMPDN:
+            self.accumulator = self.number((command, self.tile(argument)))
+            self.tiles[argument] = self.accumulator
+
+
+def number_values(code):
+    # Looks at each load followed by an addition or subtraction: a value which was computed before is loaded from
+    # the tile holding it, and a sum whose right operand is in the hands already is added the other way around
+    numbering = ValueNumbering()
+    result = []
+    i = 0
+    while i < len(code):
+        command, argument, indirect, line = code[i]
+        replacement = None
+        if command == COPYFROM and not indirect and i + 1 < len(code) and code[i + 1][0] in (ADD, SUB) \
+                and not code[i + 1][2]:
+            operation, operand = code[i + 1][:2]
+            left = numbering.tile(argument)
+            right = numbering.tile(operand)
+            value = numbering.values.get(numbering.expression(operation, left, right))
+            if value is not None and value == numbering.accumulator:
+                replacement = []
+            elif value is not None and numbering.holder(value) is not None:
+                replacement = [(COPYFROM, numbering.holder(value), False, line)]
+            elif operation == ADD and numbering.accumulator == right:
+                replacement = [(ADD, argument, False, code[i + 1][3])]
+        if replacement is None:
+            replacement = [code[i]]
+            i += 1
+        else:
+            i += 2
+        for instruction in replacement:
+            numbering.transfer(instruction)
+        result.extend(replacement)
+    return result
+
+
+def split_blocks(code):
+    # A block starts with its labels and ends with a jump or in front of the next label
+    blocks = []
+    block = []
+    for instruction in code:
+        if instruction[0] == LABEL and block and block[-1][0] != LABEL:
+            blocks.append(block)
+            block = []
+        block.append(instruction)
+        if instruction[0] in JUMPS:
+            blocks.append(block)
+            block = []
+    if block:
+        blocks.append(block)
+    return blocks
+
+
+def fresh_labels(code):
+    index = max([argument for command, argument, _, _ in code if command == LABEL] + [-1])
+    while True:
+        index += 1
+        yield index
+
+
+def layout_cost(order, follow):
+    # Executions of the jumps needed, because a block is not followed by its successor
+    cost = 0
+    for position, index in enumerate(order):
+        following = order[position + 1] if position + 1 < len(order) else len(order)
+        target, weight = follow[index]
+        if target != following:
+            cost += weight
+    return cost
+
+
+def layout_blocks(code, counts, taken):
+    # Chain the blocks along their most executed edges, so the hot path falls through (Pettis-Hansen).
+    # A conditional jump can not be inverted, only the block after it can be moved.
+    blocks = split_blocks(code)
+    end_labels = []
+    if blocks and all(instruction[0] == LABEL for instruction in blocks[-1]):
+        end_labels = blocks.pop()
+    labels = fresh_labels(code)
+    if not end_labels:
+        end_labels = [(LABEL, next(labels), False, 0)]
+    for i, block in enumerate(blocks):
+        if block[0][0] != LABEL:
+            blocks[i] = [(LABEL, next(labels), False, block[0][3])] + block
+    end = len(blocks)
+    block_of_label = dict((label[1], end) for label in end_labels)
+    for i, block in enumerate(blocks):
+        for command, argument, _, _ in block:
+            if command == LABEL:
+                block_of_label[argument] = i
+    follow = []
+    position = 0
+    for i, block in enumerate(blocks):
+        position += len([instruction for instruction in block if instruction[0] != LABEL])
+        command, argument, _, _ = block[-1]
+        if command == JUMP:
+            follow.append((block_of_label[argument], counts[position - 1]))
+        elif command in JUMPS:
+            follow.append((i + 1, counts[position - 1] - taken[position - 1]))
+        else:
+            follow.append((i + 1, counts[position - 1]))
+    chain_of = list(range(end))
+    chains = dict((i, [i]) for i in range(end))
+    edges = sorted((-weight, source, target) for source, (target, weight) in enumerate(follow))
+    for _, source, target in edges:
+        if target == end or target == 0:
+            continue
+        source_chain = chain_of[source]
+        target_chain = chain_of[target]
+        if source_chain != target_chain and chains[source_chain][-1] == source and chains[target_chain][0] == target:
+            for index in chains[target_chain]:
+                chain_of[index] = source_chain
+            chains[source_chain].extend(chains.pop(target_chain))
+    order = []
+    for head in sorted(chains):
+        order.extend(chains[head])
+    if layout_cost(order, follow) >= layout_cost(list(range(end)), follow):
+        return code
+    result = []
+    for position, index in enumerate(order):
+        following = order[position + 1] if position + 1 < end else end
+        block = blocks[index]
+        line = block[-1][3]
+        if block[-1][0] == JUMP:
+            block = block[:-1]
+        result.extend(block)
+        target = follow[index][0]
+        if target != following:
+            target_label = end_labels[0] if target == end else blocks[target][0]
+            result.append((JUMP, target_label[1], False, line))
+    return result + end_labels
+
+
+class ControlFlowGraph(object):
+    # The blocks of split_blocks with their edges, block number len(blocks) stands for the end of the program
+    def __init__(self, code):
+        self.blocks = split_blocks(code)
+        self.exit = len(self.blocks)
+        block_of_label = {}
+        for i, block in enumerate(self.blocks):
+            for command, argument, _, _ in block:
+                if command == LABEL:
+                    block_of_label[argument] = i
+        self.successors = []
+        for i, block in enumerate(self.blocks):
+            command, argument, _, _ = block[-1]
+            targets = []
+            if command in JUMPS:
+                targets.append(block_of_label[argument])
+            if command != JUMP:
+                targets.append(i + 1)
+            self.successors.append(targets)
+        self.successors.append([])
+        self.predecessors = [[] for _ in range(self.exit + 1)]
+        for i, targets in enumerate(self.successors):
+            for target in targets:
+                if i not in self.predecessors[target]:
+                    self.predecessors[target].append(i)
+
+
+def thread_jumps(code):
+    # A jump to a block which only jumps on goes to the final target at once. After a taken JUMPZ the hands hold
+    # zero and after a taken JUMPN a negative number, so a conditional jump is threaded through the conditional
+    # jumps whose outcome is known at its target as well, a jump which is never taken is stepped over.
+    labels = label_positions(code)
+    new_labels = fresh_labels(code)
+    # Labels needed in front of an instruction, because a jump was threaded past the jump before it
+    inserted = {}
+    result = []
+    for command, argument, indirect, line in code:
+        if command in JUMPS:
+            position = thread(code, labels, command, labels[argument])
+            if code[position - 1][0] == LABEL:
+                argument = code[position - 1][1]
+            else:
+                if position not in inserted:
+                    inserted[position] = next(new_labels)
+                argument = inserted[position]
+        result.append((command, argument, indirect, line))
+    if not inserted:
+        return result
+    labelled = []
+    for i, instruction in enumerate(result):
+        if i in inserted:
+            labelled.append((LABEL, inserted[i], False, instruction[3]))
+        labelled.append(instruction)
+    if len(result) in inserted:
+        labelled.append((LABEL, inserted[len(result)], False, 0))
+    return labelled
+
+
+def thread(code, labels, command, position):
+    # The position a jump of kind command to position ends up at, it is either an instruction or the end
+    visited = set()
+    while True:
+        while position < len(code) and code[position][0] == LABEL:
+            position += 1
+        if position == len(code) or position in visited:
+            return position
+        visited.add(position)
+        following, argument, _, _ = code[position]
+        if following == JUMP or following == command:
+            position = labels[argument]
+        elif command != JUMP and following in JUMPS:
+            position += 1
+        else:
+            return position
+
+
+def merge_tails(code):
+    # The instructions in front of a JUMP which equal the ones falling into its target are replaced by a jump to
+    # them (cross jumping). The jumping path executes as many instructions as before, the code gets shorter.
+    # Every merge which does not overlap an earlier one is done at once, the others are left to the next round.
+    labels = label_positions(code)
+    new_labels = fresh_labels(code)
+    # Replaced ranges by their start: (end, label), and the labels of the kept ranges by their start
+    replaced = {}
+    kept = []
+    starts = {}
+    for i, (command, argument, _, line) in enumerate(code):
+        if command != JUMP:
+            continue
+        target = labels[argument]
+        while target > 0 and code[target - 1][0] == LABEL:
+            target -= 1
+        length = 0
+        while (length < i and length < target and code[i - length - 1][0] not in JUMPS + (LABEL,) and
+               code[i - length - 1][:3] == code[target - length - 1][:3]):
+            length += 1
+        if length == 0:
+            continue
+        start = target - length
+        ranges = [(begin, begin_end[0]) for begin, begin_end in replaced.items()]
+        if overlaps([(start, target)], ranges + [(i - length, i + 1)]) or \
+                overlaps([(i - length, i + 1)], ranges + kept):
+            continue
+        if start not in starts:
+            starts[start] = code[start - 1][1] if start > 0 and code[start - 1][0] == LABEL else next(new_labels)
+        replaced[i - length] = (i + 1, starts[start], line)
+        kept.append((start, target))
+    if not replaced:
+        return code
+    result = []
+    position = 0
+    while position < len(code):
+        if position in starts and not (position > 0 and code[position - 1][0] == LABEL and
+                                       code[position - 1][1] == starts[position]):
+            result.append((LABEL, starts[position], False, code[position][3]))
+        if position in replaced:
+            end, label, line = replaced[position]
+            result.append((JUMP, label, False, line))
+            position = end
+        else:
+            result.append(code[position])
+            position += 1
+    return result
+
+
+def overlaps(ranges, others):
+    return any(start < other_end and other_start < end for start, end in ranges for other_start, other_end in others)
+
+
+def merge_blocks(code):
+    # A block which is only entered by the JUMP ending another block is moved behind that block, when it ends with a
+    # JUMP itself. That JUMP is executed once less, nothing else changes. Chains of such blocks are moved at once.
+    cfg = ControlFlowGraph(code)
+    follower = {}
+    for block in range(1, cfg.exit):
+        if len(cfg.predecessors[block]) != 1:
+            continue
+        predecessor = cfg.predecessors[block][0]
+        if cfg.blocks[predecessor][-1][0] == JUMP and cfg.blocks[block][-1][0] == JUMP and predecessor != block:
+            follower[predecessor] = block
+    if not follower:
+        return code
+    moved = set(follower.values())
+    result = []
+    placed = set()
+    # The blocks which stay in place go first, blocks which only enter each other in a circle are never reached
+    for block in sorted(range(cfg.exit), key=lambda block: block in moved):
+        while block not in placed:
+            placed.add(block)
+            if follower.get(block) is not None and follower[block] not in placed:
+                result.extend(cfg.blocks[block][:-1])
+                block = follower[block]
+            else:
+                result.extend(cfg.blocks[block])
+    return result
+
+
+def profile(code, samples):
+    # Executions of every instruction and how often the jumps were taken, summed over the samples
+    program = hrsim.Program(hrir.Code(code))
+    counts = [0] * program.size
+    taken = [0] * program.size
+    for inbox, floor in samples:
+        try:
+            result = program.run(inbox, floor, max_steps=PROFILE_STEPS, profile=True)
+        except hrsim.SimulationError:
+            continue
+        for i in range(program.size):
+            counts[i] += result.counts[i]
+            taken[i] += result.taken[i]
+    return counts, taken
+
+
+PASSES = [remove_redundant_moves, remove_dead_loads, remove_jumps_to_next, remove_unused_labels, merge_labels,
+          remove_dead_stores, fold_constants, number_values, thread_jumps, merge_tails, merge_blocks]
+
+
+def run_passes(code, passes):
+    changed = True
+    while changed:
+        changed = False
+        for optimization in passes:
+            optimized = optimization(code)
+            if optimized != code:
+                code = optimized
+                changed = True
+    return code
+
+
+def optimize(instructions, fixed_positions=frozenset(), samples=None):
+    # samples are (inbox, floor) pairs, which are used to lay out the code along the executed paths.
+    # The passes work on a list of (opcode, operand, indirect, source line) tuples and return a new list.
+    code = list(instructions)
+    passes = PASSES + [lambda instructions: reuse_floor_tiles(instructions, fixed_positions)]
+    code = run_passes(code, passes)
+    if samples:
+        counts, taken = profile(code, samples)
+        code = run_passes(layout_blocks(code, counts, taken), passes)
+    return hrir.Code(rename_labels(code))
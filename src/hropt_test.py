@@ -0,0 +1,252 @@
+import unittest
+import hrc
+import hrir
+import hropt
+import hrsim
+
+
+def optimize(lines, fixed_positions=frozenset()):
+    return hropt.optimize(hrir.parse(lines), fixed_positions).format()
+
+
+class OptimizerTestCase(unittest.TestCase):
+    def test_remove_load_after_store(self):
+        result = hrc.compile("x=input();output(x);", optimize=True)
+        self.assertEqual(["INBOX", "OUTBOX"], result)
+
+    def test_keep_load_after_output(self):
+        result = hrc.compile("x=input();output(x);output(x);", optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "OUTBOX", "COPYFROM 0", "OUTBOX"], result)
+
+    def test_remove_redundant_store(self):
+        code = list(hrir.parse(["INBOX", "COPYTO 0", "COPYTO 1", "COPYFROM 0", "COPYTO 1", "OUTBOX"]))
+        result = hrir.Code(hropt.remove_redundant_moves(code)).format()
+        self.assertEqual(["INBOX", "COPYTO 0", "COPYTO 1", "OUTBOX"], result)
+
+    def test_keep_load_after_indirect_load(self):
+        code = ["INBOX", "COPYTO 0", "COPYFROM [1]", "OUTBOX", "COPYFROM 0", "OUTBOX"]
+        self.assertEqual(code, optimize(code))
+
+    def test_remove_comparison_reload(self):
+        result = hrc.compile("a=input(); if (a != 0) { output(a); } output(a);", optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "JUMPZ A", "OUTBOX", "A:", "COPYFROM 0", "OUTBOX"], result)
+
+    def test_keep_load_when_one_path_differs(self):
+        result = optimize(["INBOX", "COPYTO 0", "JUMPZ A", "INBOX", "A:", "COPYFROM 0", "OUTBOX"])
+        self.assertEqual(["INBOX", "COPYTO 0", "JUMPZ A", "INBOX", "A:", "COPYFROM 0", "OUTBOX"], result)
+
+    def test_remove_jump_to_next(self):
+        result = optimize(["A:", "INBOX", "JUMPZ B", "JUMP B", "B:", "OUTBOX", "JUMP A"])
+        self.assertEqual(["A:", "INBOX", "OUTBOX", "JUMP A"], result)
+
+    def test_remove_unreachable_code(self):
+        result = optimize(["A:", "INBOX", "OUTBOX", "JUMP A", "INBOX", "OUTBOX"])
+        self.assertEqual(["A:", "INBOX", "OUTBOX", "JUMP A"], result)
+
+    def test_if_else_reload_removed(self):
+        result = hrc.compile("a=0; b=1; if (a != 0) { output(a); } else { output(b); }", optimize=True)
+        self.assertEqual(["COPYFROM 0", "JUMPZ A", "JUMP B",
+                          "A:", "COPYFROM 1",
+                          "B:", "OUTBOX"], result)
+
+    def test_remove_dead_store(self):
+        result = optimize(["INBOX", "COPYTO 0", "INBOX", "COPYTO 0", "COPYFROM 0", "OUTBOX"])
+        self.assertEqual(["INBOX", "INBOX", "OUTBOX"], result)
+
+    def test_keep_store_read_in_loop(self):
+        code = ["INBOX", "COPYTO 0", "A:", "INBOX", "ADD 0", "COPYTO 0", "OUTBOX", "JUMP A"]
+        self.assertEqual(code, optimize(code))
+
+    def test_keep_store_before_indirect_read(self):
+        code = ["INBOX", "COPYTO 3", "COPYFROM [0]", "OUTBOX"]
+        self.assertEqual(code, optimize(code))
+
+    def test_reuse_floor_tiles(self):
+        result = hrc.compile("a=input(); b=input(); output(b-a); c=input(); d=input(); output(d-c);",
+                             optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "INBOX", "SUB 0", "OUTBOX",
+                          "INBOX", "COPYTO 0", "INBOX", "SUB 0", "OUTBOX"], result)
+
+    def test_keep_fixed_tiles(self):
+        code = ["INBOX", "COPYTO 3", "INBOX", "SUB 3", "OUTBOX", "INBOX", "COPYTO 0", "INBOX", "SUB 0", "OUTBOX"]
+        self.assertEqual(["INBOX", "COPYTO 0", "INBOX", "SUB 0", "OUTBOX",
+                          "INBOX", "COPYTO 0", "INBOX", "SUB 0", "OUTBOX"], optimize(code))
+        self.assertEqual(["INBOX", "COPYTO 1", "INBOX", "SUB 1", "OUTBOX",
+                          "INBOX", "COPYTO 0", "INBOX", "SUB 0", "OUTBOX"], optimize(code, {0}))
+
+    def test_keep_tiles_read_before_written(self):
+        code = ["INBOX", "COPYTO 0", "INBOX", "SUB 0", "ADD 5", "OUTBOX"]
+        self.assertEqual(code, optimize(code))
+
+    def test_merge_labels(self):
+        result = optimize(["A:", "B:", "INBOX", "JUMPZ A", "JUMPN B", "OUTBOX", "JUMP B"])
+        self.assertEqual(["A:", "INBOX", "JUMPZ A", "JUMPN A", "OUTBOX", "JUMP A"], result)
+
+    def test_rename_labels(self):
+        result = optimize(["C:", "INBOX", "JUMPZ E", "OUTBOX", "JUMP C", "E:", "OUTBOX"])
+        self.assertEqual(["A:", "INBOX", "JUMPZ B", "OUTBOX", "JUMP A", "B:", "OUTBOX"], result)
+
+    def test_subtract_known_zero(self):
+        result = hrc.compile("a=input(); z=a-a; b=input(); output(b-z); output(z);", optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "SUB 0", "COPYTO 0", "INBOX", "OUTBOX", "COPYFROM 0", "OUTBOX"],
+                         result)
+
+    def test_remove_branch_never_taken(self):
+        result = hrc.compile("a=input(); z=a-a; if (z != 0) { output(a); } output(z);", optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "SUB 0", "OUTBOX"], result)
+
+    def test_remove_branch_by_range(self):
+        result = hrc.compile("a=input(); z=a-a; z++; if (z >= 0) { output(a); } output(z);", optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "SUB 0", "COPYTO 1", "BUMPUP 1",
+                          "COPYFROM 0", "OUTBOX", "COPYFROM 1", "OUTBOX"], result)
+
+    def test_fold_branch_in_counting_loop(self):
+        code = ["INBOX", "COPYTO 0", "SUB 0", "COPYTO 1", "A:", "BUMPUP 1", "OUTBOX", "COPYFROM 1", "JUMPN A",
+                "INBOX", "OUTBOX"]
+        self.assertEqual(["INBOX", "COPYTO 0", "SUB 0", "COPYTO 0", "BUMPUP 0", "OUTBOX", "INBOX", "OUTBOX"],
+                         optimize(code))
+
+    def test_keep_branch_with_widened_range(self):
+        code = ["INBOX", "COPYTO 0", "SUB 0", "COPYTO 1", "A:", "INBOX", "JUMPZ B", "BUMPUP 1", "JUMP C",
+                "B:", "BUMPDN 1", "C:", "JUMPN D", "JUMP A", "D:", "OUTBOX"]
+        self.assertIn("JUMPN", [line.split(" ")[0] for line in optimize(code)])
+
+    def test_remove_dead_load(self):
+        result = optimize(["INBOX", "COPYTO 0", "INBOX", "COPYTO 1", "COPYFROM 0", "ADD 1", "INBOX",
+                           "SUB 1", "SUB 0", "OUTBOX"])
+        self.assertEqual(["INBOX", "COPYTO 0", "INBOX", "COPYTO 1", "INBOX", "SUB 1", "SUB 0", "OUTBOX"],
+                         result)
+
+    def test_commutative_addition(self):
+        result = hrc.compile("a=input(); b=input(); output(a+b);", optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "INBOX", "ADD 0", "OUTBOX"], result)
+
+    def test_reuse_computed_sum(self):
+        result = hrc.compile("a=input(); b=input(); c=a+b; d=b+a; output(d); output(c);", optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "INBOX", "ADD 0", "COPYTO 0", "OUTBOX", "COPYFROM 0", "OUTBOX"],
+                         result)
+
+    def test_reuse_zero(self):
+        result = hrc.compile("a=input(); b=input(); z=a-a; y=b-b; output(y); output(z); output(b);", optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "INBOX", "COPYTO 1", "COPYFROM 0", "SUB 0", "COPYTO 0", "OUTBOX",
+                          "COPYFROM 0", "OUTBOX", "COPYFROM 1", "OUTBOX"], result)
+
+    def test_no_value_reuse_across_blocks(self):
+        code = ["INBOX", "COPYTO 1", "INBOX", "COPYTO 0", "A:", "COPYFROM 0", "ADD 1", "OUTBOX", "INBOX", "COPYTO 1",
+                "JUMP A"]
+        self.assertEqual(code, optimize(code))
+
+    def test_loop_inversion(self):
+        result = hrc.compile("a=input(); while (a < 0) { output(a); a=input(); }", optimize=True)
+        self.assertEqual(["JUMP B", "A:", "OUTBOX", "B:", "INBOX", "JUMPN A"], result)
+        result = hrc.compile("a=input(); while (a == 0) { a=input(); } output(a);", optimize=True)
+        self.assertEqual(["A:", "INBOX", "JUMPZ A", "OUTBOX"], result)
+
+    def test_loop_inversion_keeps_compared_tiles(self):
+        # "a=3;" within the body only moves a for the code after it, the comparison still reads tile 0
+        result = hrc.compile("a=input(); while (a < 0) { output(a); a=3; }", optimize=True)
+        self.assertEqual(["INBOX", "COPYTO 0", "JUMP B", "A:", "OUTBOX", "B:", "COPYFROM 0", "JUMPN A"], result)
+
+    def test_no_loop_inversion_without_optimization(self):
+        result = hrc.compile("a=0; while( a < 0 ) { output(a); }")
+        self.assertEqual(["A:", "COPYFROM 0", "JUMPN C", "JUMP B", "C:", "COPYFROM 0", "OUTBOX", "JUMP A", "B:"],
+                         result)
+
+    def test_unroll_counted_loop(self):
+        code = "a=input(); z=a-a; n=z; n++; n++; c=z; while (c < n) { output(a); c++; }"
+        self.assertIn("JUMPN A", hrc.compile(code, optimize=True))
+        self.assertEqual(["INBOX", "COPYTO 0", "SUB 0", "COPYTO 1", "COPYTO 2", "BUMPUP 2", "BUMPUP 2",
+                          "COPYFROM 0", "OUTBOX", "BUMPUP 1", "COPYFROM 0", "OUTBOX", "BUMPUP 1"],
+                         hrc.compile(code, optimize=True, favor="speed"))
+
+    def test_remove_loop_without_iterations(self):
+        result = hrc.compile("a=input(); z=a-a; c=z; while (c < z) { output(a); c++; } output(a);", optimize=True)
+        self.assertEqual(["INBOX", "OUTBOX"], result)
+
+    def test_no_unrolling_after_branch(self):
+        code = "a=input(); z=a-a; n=z; n++; c=z; if (a == 0) { c++; } while (c < n) { output(a); c++; }"
+        self.assertEqual(1, hrc.compile(code, optimize=True, favor="speed").count("JUMPN A"))
+
+    def test_constants_of_shared_tiles(self):
+        # a and b are both placed on tile 5, so b++ changes a as well
+        for code, outbox in [("a=5; b=5; n=input(); a=n-n; b++; while (a != 0) { output(n); a--; }", [7]),
+                             ("a=5; b=5; n=input(); a=n-n; b++; b++; while (a != 0) { output(n); b--; }", [7, 7])]:
+            for favor in ["size", "speed"]:
+                self.assertEqual(outbox, hrsim.run(hrc.compile(code, optimize=True, favor=favor), [7]).outbox)
+
+    def test_unroll_loop_with_unknown_trip_count(self):
+        code = "while (true) { a=input(); while (a != 0) { output(a); a--; } }"
+        self.assertEqual(["A:", "INBOX", "COPYTO 0", "B:", "JUMPZ A", "OUTBOX", "BUMPDN 0", "JUMPZ A", "OUTBOX",
+                          "BUMPDN 0", "JUMP B"], hrc.compile(code, optimize=True, favor="speed"))
+
+    def test_no_unrolling_with_moved_variable(self):
+        # The plain loop reads tile 0 in every iteration, copies of the body after "a=3;" would read tile 3
+        code = "a=input(); while (a != 0) { output(a); a=3; }"
+        self.assertEqual(["INBOX", "COPYTO 0", "A:", "COPYFROM 0", "JUMPZ B", "OUTBOX", "JUMP A", "B:"],
+                         hrc.compile(code, optimize=True, favor="speed"))
+        code = "a=input(); z=a-a; n=z; n++; c=z; while (c < n) { output(a); a=5; c++; }"
+        self.assertIn("JUMPN A", hrc.compile(code, optimize=True, favor="speed"))
+
+    def test_profile_skips_endless_samples(self):
+        code = list(hrir.parse(["A:", "INBOX", "JUMPZ A"]))
+        # The first sample outlasts the step limit and is left out
+        samples = [([0] * hropt.PROFILE_STEPS, {}), ([0, 1], {})]
+        self.assertEqual(([2, 2], [0, 1]), hropt.profile(code, samples))
+
+    def test_layout_hot_path_falls_through(self):
+        code = "while(true) { a=input(); if (a == 0) { output(a); output(a); } a++; output(a); }"
+        self.assertEqual(["A:", "INBOX", "COPYTO 0", "JUMPZ B", "JUMP C", "B:", "OUTBOX", "COPYFROM 0", "OUTBOX",
+                          "C:", "BUMPUP 0", "OUTBOX", "JUMP A"], hrc.compile(code, optimize=True))
+        result = hrc.compile(code, optimize=True, samples=[([1, 2, 3, 0, 4], {})])
+        self.assertEqual(["A:", "INBOX", "COPYTO 0", "JUMPZ C", "B:", "BUMPUP 0", "OUTBOX", "JUMP A",
+                          "C:", "OUTBOX", "COPYFROM 0", "OUTBOX", "JUMP B"], result)
+
+    def test_layout_keeps_better_order(self):
+        code = "while(true) { a=input(); if (a == 0) { output(a); } }"
+        self.assertEqual(hrc.compile(code, optimize=True),
+                         hrc.compile(code, optimize=True, samples=[([0, 0, 0, 1], {})]))
+
+    def test_control_flow_graph(self):
+        cfg = hropt.ControlFlowGraph(list(hrir.parse(["INBOX", "JUMPZ A", "OUTBOX", "JUMP B", "A:", "OUTBOX",
+                                                      "B:", "INBOX", "JUMP B", "OUTBOX"])))
+        self.assertEqual([[2, 1], [3], [3], [3], [5], []], cfg.successors)
+        self.assertEqual([[], [0], [0], [1, 2, 3], [], [4]], cfg.predecessors)
+
+    def test_thread_jumps(self):
+        # After the taken JUMPZ the hands hold zero, so the JUMPN at A is never taken
+        code = hrir.parse(["INBOX", "JUMPZ A", "JUMP B", "A:", "JUMPN B", "OUTBOX", "B:", "JUMP C", "C:", "INBOX"])
+        self.assertEqual(["INBOX", "JUMPZ D", "JUMP C", "A:", "JUMPN C", "D:", "OUTBOX", "B:", "JUMP C", "C:",
+                          "INBOX"], hrir.Code(hropt.thread_jumps(list(code))).format())
+
+    def test_merge_tails(self):
+        code = hrir.parse(["INBOX", "JUMPZ A", "COPYTO 0", "OUTBOX", "JUMP B", "A:", "COPYTO 1", "OUTBOX", "B:",
+                           "INBOX"])
+        self.assertEqual(["INBOX", "JUMPZ A", "COPYTO 0", "JUMP C", "A:", "COPYTO 1", "C:", "OUTBOX", "B:",
+                          "INBOX"], hrir.Code(hropt.merge_tails(list(code))).format())
+        # Both if statements are merged in one call
+        code = hrir.parse(["INBOX", "JUMPZ A", "COPYTO 0", "OUTBOX", "JUMP B", "A:", "COPYTO 1", "OUTBOX", "B:",
+                           "INBOX", "JUMPZ C", "COPYTO 2", "OUTBOX", "JUMP D", "C:", "COPYTO 3", "OUTBOX", "D:",
+                           "INBOX"])
+        self.assertEqual(["INBOX", "JUMPZ A", "COPYTO 0", "JUMP E", "A:", "COPYTO 1", "E:", "OUTBOX", "B:", "INBOX",
+                          "JUMPZ C", "COPYTO 2", "JUMP F", "C:", "COPYTO 3", "F:", "OUTBOX", "D:", "INBOX"],
+                         hrir.Code(hropt.merge_tails(list(code))).format())
+
+    def test_merge_blocks(self):
+        code = hrir.parse(["A:", "INBOX", "JUMPZ C", "JUMP B", "C:", "OUTBOX", "JUMP A", "B:", "INBOX", "OUTBOX",
+                           "JUMP A"])
+        self.assertEqual(["A:", "INBOX", "JUMPZ C", "B:", "INBOX", "OUTBOX", "JUMP A", "C:", "OUTBOX", "JUMP A"],
+                         hrir.Code(hropt.merge_blocks(list(code))).format())
+        # A chain of blocks is moved in one call
+        code = hrir.parse(["A:", "INBOX", "JUMP B", "C:", "OUTBOX", "JUMP A", "B:", "INBOX", "JUMP C"])
+        self.assertEqual(["A:", "INBOX", "B:", "INBOX", "C:", "OUTBOX", "JUMP A"],
+                         hrir.Code(hropt.merge_blocks(list(code))).format())
+
+    def test_threaded_nested_if(self):
+        # The inner if ends right in front of the jump to the end of the outer one
+        code = "while(true) { a=input(); if (a != 0) { if (a < 0) { output(a); } } }"
+        self.assertEqual(["A:", "INBOX", "JUMPZ A", "JUMPN B", "JUMP A", "B:", "OUTBOX", "JUMP A"],
+                         hrc.compile(code, optimize=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+from collections import OrderedDict
+import argparse
+import hashlib
+import json
+import socket
+import socketserver
+import sys
+import threading
+
+from rply.errors import LexingError, ParsingError
+
+import hrast
+import hrc
+
+# Error codes of JSON-RPC 2.0, and one for programs which do not compile
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+COMPILE_ERROR = 1
+
+
+class RequestError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class CompileServer(object):
+    # Keeps one warm compiler and the output of the last compiled sources, requests are answered one at a time
+    def __init__(self, cache_size=256):
+        self.compiler = hrc.getCompiler()
+        # Compiled code by (hash of the source, optimize, favor), the least recently used one is dropped first
+        self.outputs = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.methods = {"compile": self.compile, "diagnostics": self.diagnostics, "stats": self.stats}
+
+    def source(self, params):
+        if "source" in params:
+            if not isinstance(params["source"], str):
+                raise RequestError(INVALID_PARAMS, "'source' must be a string")
+            return params["source"]
+        if "path" in params:
+            if not isinstance(params["path"], str):
+                raise RequestError(INVALID_PARAMS, "'path' must be a string")
+            try:
+                with open(params["path"], 'r') as f:
+                    return f.read()
+            except (IOError, UnicodeDecodeError) as e:
+                raise RequestError(INVALID_PARAMS, str(e))
+        raise RequestError(INVALID_PARAMS, "Either 'source' or 'path' is needed")
+
+    def compile(self, params):
+        source = self.source(params)
+        optimize = bool(params.get("optimize", False))
+        favor = params.get("favor", hrast.SIZE)
+        if favor not in (hrast.SPEED, hrast.SIZE):
+            raise RequestError(INVALID_PARAMS, "favor is either 'speed' or 'size'")
+        key = (hashlib.sha1(source.encode()).hexdigest(), optimize, favor)
+        with self.lock:
+            if key in self.outputs:
+                self.hits += 1
+                self.outputs.move_to_end(key)
+                code = self.outputs[key]
+            else:
+                self.misses += 1
+                try:
+                    code = self.compiler.compileIR(self.compiler.parse(source), optimize, favor=favor)
+                except Exception:
+                    raise RequestError(COMPILE_ERROR, "Compilation failed", self.find_problems(source))
+                self.outputs[key] = code
+                if len(self.outputs) > self.cache_size:
+                    self.outputs.popitem(last=False)
+        return {"code": code.format(), "size": code.size()}
+
+    def diagnostics(self, params):
+        source = self.source(params)
+        with self.lock:
+            return {"diagnostics": self.find_problems(source)}
+
+    def find_problems(self, source):
+        # The position is known for syntax errors, the other errors belong to the statement which was compiled
+        try:
+            tree = self.compiler.parse(source)
+        except (LexingError, ParsingError) as e:
+            position = e.getsourcepos()
+            if position is None:
+                return [problem(source.count("\n") + 1, None, "Unexpected end of the program")]
+            if isinstance(e, LexingError):
+                return [problem(position.lineno, position.colno, "Unknown character")]
+            return [problem(position.lineno, position.colno, "Syntax error")]
+        ctx = hrc.Context()
+        try:
+            tree.compile(ctx)
+        except Exception as e:
+            return [problem(ctx.code.line or None, None, str(e))]
+        return []
+
+    def stats(self, params):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "outputs": len(self.outputs),
+                    "trees": len(self.compiler.trees)}
+
+    def handle(self, message):
+        # Answers one JSON-RPC request, returns None for notifications
+        try:
+            request = json.loads(message)
+        except ValueError:
+            return response(None, error=RequestError(PARSE_ERROR, "Invalid JSON"))
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return response(None, error=RequestError(INVALID_REQUEST, "Invalid request"))
+        identifier = request.get("id")
+        params = request.get("params", {})
+        try:
+            if request["method"] not in self.methods:
+                raise RequestError(METHOD_NOT_FOUND, "Unknown method '" + request["method"] + "'")
+            if not isinstance(params, dict):
+                raise RequestError(INVALID_PARAMS, "params must be an object")
+            result = self.methods[request["method"]](params)
+        except RequestError as e:
+            if "id" not in request:
+                return None
+            return response(identifier, error=e)
+        except Exception:
+            # A bad request must not stop the server, or the thread of its client
+            if "id" not in request:
+                return None
+            return response(identifier, error=RequestError(INTERNAL_ERROR, "Internal error"))
+        if "id" not in request:
+            return None
+        return response(identifier, result)
+
+
+def problem(line, column, message):
+    return {"line": line, "column": column, "message": message}
+
+
+def response(identifier, result=None, error=None):
+    answer = {"jsonrpc": "2.0", "id": identifier}
+    if error is not None:
+        answer["error"] = {"code": error.code, "message": error.message}
+        if error.data is not None:
+            answer["error"]["data"] = error.data
+    else:
+        answer["result"] = result
+    return json.dumps(answer)
+
+
+def serve_lines(server, reader, writer):
+    # One request per line and one answer per line
+    for message in reader:
+        if not message.strip():
+            continue
+        answer = server.handle(message)
+        if answer is not None:
+            writer.write(answer + "\n")
+            writer.flush()
+
+
+class StreamHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        reader = (line.decode() for line in self.rfile)
+        serve_lines(self.server.compile_server, reader, TextWriter(self.wfile))
+
+
+class TextWriter(object):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text.encode())
+
+    def flush(self):
+        self.stream.flush()
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def create_server(address, compile_server=None):
+    # A path is a unix socket, a (host, port) pair a TCP socket. Every client is served by its own thread.
+    if isinstance(address, str):
+        server = UnixServer(address, StreamHandler)
+    else:
+        server = TCPServer(address, StreamHandler)
+    server.compile_server = compile_server or CompileServer()
+    return server
+
+
+def call(address, method, params, identifier=1):
+    # A client for a single request, for scripts and the tests
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as connection:
+        connection.connect(address)
+        request = {"jsonrpc": "2.0", "id": identifier, "method": method, "params": params}
+        connection.sendall((json.dumps(request) + "\n").encode())
+        with connection.makefile('r') as answers:
+            return json.loads(answers.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--stdio", action="store_true", help="Read requests from stdin, answer on stdout")
+    group.add_argument("--socket", help="Listen on this unix socket")
+    group.add_argument("--port", type=int, help="Listen on this TCP port of localhost")
+    args = parser.parse_args()
+    compile_server = CompileServer()
+    if args.stdio:
+        serve_lines(compile_server, sys.stdin, sys.stdout)
+        return
+    server = create_server(args.socket if args.socket else ("127.0.0.1", args.port), compile_server)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
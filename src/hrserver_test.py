@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import hrserver
+
+
+class ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = hrserver.CompileServer()
+
+    def request(self, method, params, identifier=1):
+        message = json.dumps({"jsonrpc": "2.0", "id": identifier, "method": method, "params": params})
+        return json.loads(self.server.handle(message))
+
+    def test_compile(self):
+        answer = self.request("compile", {"source": "x=input(); output(x);", "optimize": True})
+        self.assertEqual({"code": ["INBOX", "OUTBOX"], "size": 2}, answer["result"])
+        self.assertEqual(1, answer["id"])
+
+    def test_output_cache(self):
+        self.request("compile", {"source": "output(input());"})
+        self.request("compile", {"source": "output(input());"})
+        self.request("compile", {"source": "output(input());", "optimize": True})
+        stats = self.request("stats", {})["result"]
+        self.assertEqual((1, 2), (stats["hits"], stats["misses"]))
+
+    def test_compile_error(self):
+        answer = self.request("compile", {"source": "a=input();\noutput(b);"})
+        self.assertEqual(hrserver.COMPILE_ERROR, answer["error"]["code"])
+        self.assertEqual([{"line": 2, "column": None, "message": "Variable 'b' is not defined"}],
+                         answer["error"]["data"])
+
+    def test_diagnostics(self):
+        self.assertEqual([], self.request("diagnostics", {"source": "output(input());"})["result"]["diagnostics"])
+        problems = self.request("diagnostics", {"source": "a=input();\n  a+;"})["result"]["diagnostics"]
+        self.assertEqual([{"line": 2, "column": 5, "message": "Syntax error"}], problems)
+        problems = self.request("diagnostics", {"source": "a=input(); output(a"})["result"]["diagnostics"]
+        self.assertEqual("Unexpected end of the program", problems[0]["message"])
+
+    def test_invalid_requests(self):
+        self.assertEqual(hrserver.PARSE_ERROR, json.loads(self.server.handle("{"))["error"]["code"])
+        self.assertEqual(hrserver.METHOD_NOT_FOUND, self.request("run", {})["error"]["code"])
+        self.assertEqual(hrserver.INVALID_PARAMS, self.request("compile", {})["error"]["code"])
+        self.assertIsNone(self.server.handle(json.dumps({"jsonrpc": "2.0", "method": "stats"})))
+
+    def test_invalid_params(self):
+        self.assertEqual(hrserver.INVALID_PARAMS, self.request("compile", {"source": 5})["error"]["code"])
+        self.assertEqual(hrserver.INVALID_PARAMS, self.request("compile", {"path": ["a.hc"]})["error"]["code"])
+        with tempfile.NamedTemporaryFile('wb', suffix=".hc", delete=False) as f:
+            f.write(b"output(input()); // \xff\n")
+        try:
+            self.assertEqual(hrserver.INVALID_PARAMS, self.request("compile", {"path": f.name})["error"]["code"])
+        finally:
+            os.remove(f.name)
+
+    def test_internal_error(self):
+        def fail(params):
+            raise KeyError("params")
+        self.server.methods["stats"] = fail
+        self.assertEqual({"code": hrserver.INTERNAL_ERROR, "message": "Internal error"},
+                         self.request("stats", {})["error"])
+        self.assertEqual([], self.request("diagnostics", {"source": "output(input());"})["result"]["diagnostics"])
+
+    def test_unix_socket(self):
+        directory = tempfile.mkdtemp()
+        address = os.path.join(directory, "hrc.sock")
+        server = hrserver.create_server(address, self.server)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            answers = [None] * 4
+
+            def client(index):
+                answers[index] = hrserver.call(address, "compile", {"source": "output(input());"}, index)
+
+            clients = [threading.Thread(target=client, args=(index,)) for index in range(4)]
+            for thread_of_client in clients:
+                thread_of_client.start()
+            for thread_of_client in clients:
+                thread_of_client.join()
+            self.assertEqual([0, 1, 2, 3], [answer["id"] for answer in answers])
+            self.assertEqual([["INBOX", "OUTBOX"]] * 4, [answer["result"]["code"] for answer in answers])
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
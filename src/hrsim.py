@@ -0,0 +1,248 @@
+from array import array
+import argparse
+import json
+
+import hrast
+import hrc
+import hrir
+from hrir import INBOX, OUTBOX, COPYFROM, COPYTO, ADD, SUB, BUMPUP, JUMP, JUMPZ, JUMPN, LABEL, JUMPS, \
+    MIN_VALUE, MAX_VALUE
+
+FLOOR_SIZE = 25
+MAX_STEPS = 1000000
+
+
+class SimulationError(Exception):
+    pass
+
+
+class Result(object):
+    def __init__(self, outbox, steps, size, floor, counts=None, taken=None):
+        self.outbox = outbox
+        self.steps = steps
+        self.size = size
+        self.floor = floor
+        # Executions per instruction and how often each jump was taken, when profiling
+        self.counts = counts
+        self.taken = taken
+
+
+class Program(object):
+    def __init__(self, code):
+        # Accepts the instructions of the compiler or formatted lines
+        if not isinstance(code, hrir.Code):
+            code = hrir.parse(code)
+        # Resolve the labels to instruction offsets first, so jumps become plain integers
+        labels = {}
+        size = 0
+        for opcode, operand, _, _ in code:
+            if opcode == LABEL:
+                labels[operand] = size
+            else:
+                size += 1
+        self.opcodes = array('B')
+        self.operands = array('i')
+        self.indirect = array('B')
+        # The source line of every instruction, for the profile per line
+        self.lines = array('i')
+        for opcode, operand, indirect, line in code:
+            if opcode == LABEL:
+                continue
+            if opcode in JUMPS:
+                if operand not in labels:
+                    raise SimulationError("Label '" + hrir.label_name(operand) + "' is undefined")
+                operand = labels[operand]
+            self.opcodes.append(opcode)
+            self.operands.append(operand)
+            self.indirect.append(1 if indirect else 0)
+            self.lines.append(line)
+        self.size = size
+
+    def run(self, inbox, floor=None, floor_size=FLOOR_SIZE, max_steps=MAX_STEPS, profile=False):
+        tiles = [None] * floor_size
+        if isinstance(floor, dict):
+            for position, value in floor.items():
+                tiles[position] = value
+        elif floor is not None:
+            tiles[:len(floor)] = floor
+        opcodes = self.opcodes.tolist()
+        operands = self.operands.tolist()
+        indirect = self.indirect.tolist()
+        size = self.size
+        inbox = iter(inbox)
+        outbox = []
+        accumulator = None
+        counts = [0] * size if profile else None
+        taken = [0] * size if profile else None
+        steps = 0
+        pc = 0
+        while pc < size:
+            if steps >= max_steps:
+                raise SimulationError("Program did not finish within " + str(max_steps) + " steps")
+            current = pc
+            opcode = opcodes[pc]
+            operand = operands[pc]
+            if indirect[pc]:
+                operand = address(tiles, operand)
+            pc += 1
+            if opcode == COPYFROM:
+                accumulator = tiles[operand]
+                if accumulator is None:
+                    raise SimulationError("COPYFROM: floor tile " + str(operand) + " is empty")
+            elif opcode == COPYTO:
+                if accumulator is None:
+                    raise SimulationError("COPYTO: nothing in the hands")
+                tiles[operand] = accumulator
+            elif opcode == JUMP:
+                pc = operand
+            elif opcode == JUMPZ:
+                if accumulator is None:
+                    raise SimulationError("JUMPZ: nothing in the hands")
+                if accumulator == 0:
+                    pc = operand
+            elif opcode == JUMPN:
+                if accumulator is None:
+                    raise SimulationError("JUMPN: nothing in the hands")
+                if not isinstance(accumulator, str) and accumulator < 0:
+                    pc = operand
+            elif opcode == INBOX:
+                accumulator = next(inbox, None)
+                if accumulator is None:
+                    # The program ends when the inbox is empty
+                    break
+            elif opcode == OUTBOX:
+                if accumulator is None:
+                    raise SimulationError("OUTBOX: nothing in the hands")
+                outbox.append(accumulator)
+                accumulator = None
+            elif opcode == ADD or opcode == SUB:
+                accumulator = arithmetic(opcode, accumulator, tiles[operand])
+            else:
+                value = tiles[operand]
+                if value is None or isinstance(value, str):
+                    raise SimulationError("BUMP: floor tile " + str(operand) + " does not hold a number")
+                value = value + 1 if opcode == BUMPUP else value - 1
+                check_overflow(value)
+                tiles[operand] = value
+                accumulator = value
+            steps += 1
+            if profile:
+                counts[current] += 1
+                if pc != current + 1:
+                    taken[current] += 1
+        return Result(outbox, steps, size, tiles, counts, taken)
+
+
+def address(tiles, position):
+    target = tiles[position]
+    if target is None or isinstance(target, str) or not 0 <= target < len(tiles):
+        raise SimulationError("Floor tile " + str(position) + " does not hold a valid address")
+    return target
+
+
+def arithmetic(opcode, accumulator, value):
+    if accumulator is None or value is None:
+        raise SimulationError("ADD/SUB: missing value")
+    if isinstance(accumulator, str) or isinstance(value, str):
+        if opcode == SUB and isinstance(accumulator, str) and isinstance(value, str):
+            # Letters can be subtracted from each other, the result is their distance in the alphabet
+            return ord(accumulator) - ord(value)
+        raise SimulationError("ADD/SUB: can not calculate with a letter")
+    result = accumulator + value if opcode == ADD else accumulator - value
+    check_overflow(result)
+    return result
+
+
+def check_overflow(value):
+    if not MIN_VALUE <= value <= MAX_VALUE:
+        raise SimulationError("Overflow: " + str(value))
+
+
+def run(lines, inbox, floor=None, floor_size=FLOOR_SIZE, max_steps=MAX_STEPS, profile=False):
+    return Program(lines).run(inbox, floor, floor_size, max_steps, profile)
+
+
+def parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def parse_floor(entries):
+    floor = {}
+    for entry in entries:
+        position, value = entry.split("=", 1)
+        floor[int(position)] = parse_value(value)
+    return floor
+
+
+def load_samples(path):
+    # One sample per line: the inbox values, optionally followed by "|" and the floor tiles as position=value
+    samples = []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            inbox, _, floor = line.partition("|")
+            samples.append(([parse_value(value) for value in inbox.split()], parse_floor(floor.split())))
+    return samples
+
+
+def line_profile(program, result):
+    # Executed steps and taken jumps per source line, line 0 collects the instructions without a source line
+    lines = {}
+    for i in range(program.size):
+        steps, jumps = lines.get(program.lines[i], (0, 0))
+        lines[program.lines[i]] = (steps + result.counts[i], jumps + result.taken[i])
+    return lines
+
+
+def heatmap(source, lines, steps):
+    # One entry per source line: its number, text, executed steps, taken jumps and share of all steps
+    entries = []
+    for number, text in enumerate(source.splitlines(), 1):
+        line_steps, jumps = lines.get(number, (0, 0))
+        entries.append({"line": number, "source": text, "steps": line_steps, "jumps": jumps,
+                        "percent": round(100.0 * line_steps / steps, 1) if steps else 0.0})
+    return entries
+
+
+def format_heatmap(entries, width=20):
+    most = max([entry["steps"] for entry in entries] + [1])
+    rows = ["%5s %8s %6s %7s  %-*s  %s" % ("line", "steps", "jumps", "share", width, "", "source")]
+    for entry in entries:
+        bar = "#" * int(round(width * entry["steps"] / float(most)))
+        rows.append("%5d %8d %6d %6.1f%%  %-*s  %s" % (entry["line"], entry["steps"], entry["jumps"],
+                                                       entry["percent"], width, bar, entry["source"]))
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputfile", help="The input file where the hrc code lays")
+    parser.add_argument("inbox", nargs="*", help="The values in the inbox, numbers or letters")
+    parser.add_argument("-O", dest="optimize", action="store_true", help="Optimize the generated code")
+    parser.add_argument("--floor", nargs="*", default=[], help="Initial floor tiles as position=value")
+    parser.add_argument("--floor-size", type=int, default=FLOOR_SIZE, help="Number of floor tiles")
+    parser.add_argument("--favor", choices=[hrast.SPEED, hrast.SIZE], default=hrast.SIZE, help="See hrc.py --favor")
+    parser.add_argument("--heatmap", choices=["text", "json"], help="Print the executed steps per source line")
+    args = parser.parse_args()
+    code = open(args.inputfile, 'r').read()
+    program = Program(hrc.getCompiler().compileIR(hrc.parse(code), args.optimize, favor=args.favor))
+    result = program.run([parse_value(value) for value in args.inbox], parse_floor(args.floor), args.floor_size,
+                         profile=args.heatmap is not None)
+    if args.heatmap:
+        entries = heatmap(code, line_profile(program, result), result.steps)
+        if args.heatmap == "json":
+            print(json.dumps({"steps": result.steps, "size": result.size, "outbox": result.outbox,
+                              "lines": entries}, indent=2))
+            return
+        print(format_heatmap(entries))
+    print("outbox: " + " ".join(str(value) for value in result.outbox))
+    print("steps:  " + str(result.steps))
+    print("size:   " + str(result.size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+import hrc
+import hrsim
+
+
+class SimulatorTestCase(unittest.TestCase):
+    def test_copy_input_to_output(self):
+        result = hrsim.run(["A:", "INBOX", "OUTBOX", "JUMP A"], [1, "B", -3])
+        self.assertEqual([1, "B", -3], result.outbox)
+        self.assertEqual(9, result.steps)
+        self.assertEqual(3, result.size)
+
+    def test_run_off_the_end(self):
+        result = hrsim.run(["INBOX", "OUTBOX"], [1, 2])
+        self.assertEqual([1], result.outbox)
+        self.assertEqual(2, result.steps)
+
+    def test_arithmetic(self):
+        result = hrsim.run(hrc.compile("while(true) { a=input(); b=input(); output(a-b); output(a+b); }"),
+                           [5, 3, 1, 4])
+        self.assertEqual([2, 8, -3, 5], result.outbox)
+
+    def test_letters(self):
+        result = hrsim.run(hrc.compile("a=input(); b=input(); output(b-a);"), ["A", "D"])
+        self.assertEqual([3], result.outbox)
+
+    def test_bump(self):
+        result = hrsim.run(hrc.compile("a=input(); output(a++); output(a--); output(a--);"), [7])
+        self.assertEqual([8, 7, 6], result.outbox)
+
+    def test_conditional_jumps(self):
+        code = hrc.compile("while(true) { a=input(); if (a < 0) { output(a); } if (a == 0) { output(a); } }")
+        result = hrsim.run(code, [-1, 0, 1])
+        self.assertEqual([-1, 0], result.outbox)
+
+    def test_indirect_addressing(self):
+        result = hrsim.run(hrc.compile("a=0; output(*a); (*a)++; output(*a);"), [], {0: 2, 2: 5})
+        self.assertEqual([5, 6], result.outbox)
+        self.assertEqual(6, result.floor[2])
+
+    def test_floor_as_list(self):
+        result = hrsim.run(["COPYFROM 1", "OUTBOX"], [], [3, 4])
+        self.assertEqual([4], result.outbox)
+
+    def test_profile(self):
+        result = hrsim.run(["A:", "INBOX", "JUMPZ A", "OUTBOX", "JUMP A"], [0, 1, 0], profile=True)
+        self.assertEqual([3, 3, 1, 1], result.counts)
+        self.assertEqual([0, 2, 0, 1], result.taken)
+
+    def test_load_samples(self):
+        with tempfile.NamedTemporaryFile('w', suffix=".txt", delete=False) as f:
+            f.write("1 2 A\n\n3 | 9=0 2=B\n")
+        try:
+            self.assertEqual([([1, 2, "A"], {}), ([3], {9: 0, 2: "B"})], hrsim.load_samples(f.name))
+        finally:
+            os.remove(f.name)
+
+    def test_empty_hands(self):
+        self.assertRaises(hrsim.SimulationError, hrsim.run, ["OUTBOX"], [])
+
+    def test_empty_tile(self):
+        self.assertRaises(hrsim.SimulationError, hrsim.run, ["COPYFROM 0"], [])
+
+    def test_overflow(self):
+        self.assertRaises(hrsim.SimulationError, hrsim.run, ["INBOX", "COPYTO 0", "ADD 0"], [999])
+
+    def test_add_letter(self):
+        self.assertRaises(hrsim.SimulationError, hrsim.run, ["INBOX", "COPYTO 0", "ADD 0"], ["A"])
+
+    def test_step_limit(self):
+        self.assertRaises(hrsim.SimulationError, hrsim.run, ["A:", "JUMP A"], [], max_steps=100)
+
+    def test_heatmap(self):
+        source = "while(true) {\n  a=input();\n  if (a == 0) {\n    output(a);\n  }\n}"
+        program = hrsim.Program(hrc.getCompiler().compileIR(hrc.parse(source)))
+        result = program.run([0, 1, 0], profile=True)
+        self.assertEqual({1: (3, 3), 2: (6, 0), 3: (7, 3), 4: (4, 0)}, hrsim.line_profile(program, result))
+        entries = hrsim.heatmap(source, hrsim.line_profile(program, result), result.steps)
+        self.assertEqual([3, 6, 7, 4, 0, 0], [entry["steps"] for entry in entries])
+        self.assertEqual(30.0, entries[1]["percent"])
+        self.assertIn("##########  {0}".format("  if (a == 0) {"), hrsim.format_heatmap(entries, 10))
+
+    def test_undefined_label(self):
+        self.assertRaises(hrsim.SimulationError, hrsim.Program, ["JUMP A"])
+
+
+if __name__ == '__main__':
+    unittest.main()
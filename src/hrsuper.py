@@ -0,0 +1,214 @@
+from multiprocessing import Pool
+import random
+import time
+
+import hrir
+import hropt
+import hrsim
+from hrir import INBOX, COPYFROM, COPYTO, ADD, SUB, BUMPUP, TILE_COMMANDS
+
+# Longer straight-line runs are searched in windows of this size
+MAX_REGION = 8
+# Seconds for the whole search, the regions are searched in parallel
+BUDGET = 10.0
+SAMPLES = 48
+# Bounds the memory of one search, the states of every distinct candidate are kept
+MAX_CANDIDATES = 200000
+CHECK_SAMPLES = 1000
+EDGE_VALUES = [None, 0, 1, -1, 2, -2, 999, -999, "A", "B", "Z"]
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+SEED = 0
+
+
+def accumulator_live(code, i):
+    # The value in the hands is needed after instruction i - 1, unless it is replaced before being read
+    if i >= len(code):
+        return False
+    return code[i][0] not in (COPYFROM, INBOX)
+
+
+def find_regions(code):
+    # Runs of direct floor instructions without labels or jumps in between: (start, end, live tiles, accumulator live)
+    _, live_out = hropt.live_tiles(code)
+    regions = []
+    start = None
+    for i in range(len(code) + 1):
+        inside = i < len(code) and code[i][0] in TILE_COMMANDS and not code[i][2]
+        if inside and start is None:
+            start = i
+        if start is not None and (not inside or i - start == MAX_REGION):
+            if i - start >= 2:
+                regions.append((start, i, live_out[i - 1], accumulator_live(code, i)))
+            start = i if inside else None
+    return regions
+
+
+def region_key(code, start, end, live, accumulator):
+    # The region with its tiles numbered from 0, so equal regions are searched once
+    tiles = sorted(set(operand for _, operand, _, _ in code[start:end]))
+    local = dict((tile, index) for index, tile in enumerate(tiles))
+    instructions = tuple((opcode, local[operand]) for opcode, operand, _, _ in code[start:end])
+    if hropt.ANY_TILE in live:
+        live_tiles = tuple(range(len(tiles)))
+    else:
+        live_tiles = tuple(local[tile] for tile in tiles if tile in live)
+    return (instructions, len(tiles), live_tiles, accumulator), tiles
+
+
+def execute(instruction, state):
+    # One instruction on (accumulator, tiles) with the semantics of the simulator, None when it fails
+    opcode, tile = instruction
+    accumulator, tiles = state
+    value = tiles[tile]
+    try:
+        if opcode == COPYFROM:
+            if value is None:
+                return None
+            return value, tiles
+        if opcode == COPYTO:
+            if accumulator is None:
+                return None
+            return accumulator, tiles[:tile] + (accumulator,) + tiles[tile + 1:]
+        if opcode == ADD or opcode == SUB:
+            return hrsim.arithmetic(opcode, accumulator, value), tiles
+        if value is None or isinstance(value, str):
+            return None
+        value = value + 1 if opcode == BUMPUP else value - 1
+        hrsim.check_overflow(value)
+        return value, tiles[:tile] + (value,) + tiles[tile + 1:]
+    except hrsim.SimulationError:
+        return None
+
+
+def execute_all(instructions, state):
+    for instruction in instructions:
+        state = execute(instruction, state)
+        if state is None:
+            return None
+    return state
+
+
+def observe(state, live_tiles, accumulator):
+    # The part of the state which is read after the region
+    return (state[0] if accumulator else None), tuple(state[1][tile] for tile in live_tiles)
+
+
+def random_value(rng):
+    choice = rng.random()
+    if choice < 0.3:
+        return rng.choice(EDGE_VALUES)
+    if choice < 0.4:
+        return rng.choice(LETTERS)
+    if choice < 0.7:
+        return rng.randint(-9, 9)
+    return rng.randint(-999, 999)
+
+
+def random_states(rng, tile_count, count):
+    states = []
+    for value in EDGE_VALUES:
+        # The same value everywhere, so tiles which are compared or subtracted from each other are equal
+        states.append((value, (value,) * tile_count))
+    while len(states) < count:
+        states.append((random_value(rng), tuple(random_value(rng) for _ in range(tile_count))))
+    return states
+
+
+def search(key, inputs, deadline):
+    # Breadth first over the candidate sequences, a sequence leading to the same states as a shorter one is dropped
+    instructions, tile_count, live_tiles, accumulator = key
+    expected = [observe(execute_all(instructions, state), live_tiles, accumulator) for state in inputs]
+    alphabet = [(opcode, tile) for opcode in TILE_COMMANDS for tile in range(tile_count)]
+    start = tuple(inputs)
+    frontier = [((), start)]
+    seen = set([start])
+    for length in range(len(instructions)):
+        for sequence, states in frontier:
+            if all(observe(state, live_tiles, accumulator) == wanted for state, wanted in zip(states, expected)):
+                return sequence
+        if length == len(instructions) - 1:
+            break
+        following = []
+        for sequence, states in frontier:
+            if time.time() > deadline or len(seen) > MAX_CANDIDATES:
+                return None
+            for instruction in alphabet:
+                new_states = []
+                for state in states:
+                    state = execute(instruction, state)
+                    if state is None:
+                        # A failing instruction can not be undone, the original code succeeded on every input
+                        break
+                    new_states.append(state)
+                else:
+                    new_states = tuple(new_states)
+                    if new_states not in seen:
+                        seen.add(new_states)
+                        following.append((sequence + (instruction,), new_states))
+        frontier = following
+    return None
+
+
+def counterexample(key, candidate, states):
+    instructions, _, live_tiles, accumulator = key
+    for state in states:
+        result = execute_all(candidate, state)
+        if result is None or observe(result, live_tiles, accumulator) != \
+                observe(execute_all(instructions, state), live_tiles, accumulator):
+            return state
+    return None
+
+
+def valid_inputs(key, states):
+    # Inputs on which the original code fails say nothing about the candidates
+    return [state for state in states if execute_all(key[0], state) is not None]
+
+
+def superoptimize_region(key, deadline):
+    # Searches on a few inputs and checks the result on many, a failed check adds the input and searches again
+    rng = random.Random(SEED)
+    inputs = valid_inputs(key, random_states(rng, key[1], SAMPLES))
+    checks = valid_inputs(key, random_states(rng, key[1], CHECK_SAMPLES))
+    while time.time() < deadline:
+        candidate = search(key, inputs, deadline)
+        if candidate is None:
+            return None
+        failed = counterexample(key, candidate, checks)
+        if failed is None:
+            return candidate
+        inputs.append(failed)
+    return None
+
+
+def superoptimize(code, budget=BUDGET, jobs=None):
+    # Replaces straight-line regions by shorter equivalent sequences, one instruction is one step
+    instructions = list(code)
+    regions = find_regions(instructions)
+    keys = {}
+    for start, end, live, accumulator in regions:
+        key, _ = region_key(instructions, start, end, live, accumulator)
+        keys[key] = None
+    deadline = time.time() + budget
+    pending = list(keys)
+    if jobs == 1 or len(pending) <= 1:
+        results = [superoptimize_region(key, deadline) for key in pending]
+    else:
+        with Pool(jobs) as pool:
+            results = pool.starmap(superoptimize_region, [(key, deadline) for key in pending])
+    keys = dict(zip(pending, results))
+    result = []
+    position = 0
+    for start, end, live, accumulator in regions:
+        key, tiles = region_key(instructions, start, end, live, accumulator)
+        result.extend(instructions[position:start])
+        replacement = keys[key]
+        if replacement is not None and len(replacement) < end - start:
+            # The new instructions keep the source lines of the ones they replace, in order
+            result.extend((opcode, tiles[tile], False, instructions[start + i][3])
+                          for i, (opcode, tile) in enumerate(replacement))
+        else:
+            result.extend(instructions[start:end])
+        position = end
+    result.extend(instructions[position:])
+    # The shorter code may leave stores or loads the other passes can remove now
+    return hrir.Code(hropt.rename_labels(hropt.run_passes(result, hropt.PASSES)))
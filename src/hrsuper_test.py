@@ -0,0 +1,50 @@
+import os
+import unittest
+import hrc
+import hrc_bench
+import hrir
+import hrsuper
+
+
+def superoptimize(lines):
+    return hrsuper.superoptimize(hrir.parse(lines), 10, 1).format()
+
+
+class SuperoptimizerTestCase(unittest.TestCase):
+    def test_find_regions(self):
+        code = list(hrir.parse(["INBOX", "COPYTO 0", "COPYTO 1", "A:", "COPYFROM 0", "ADD 1", "COPYTO [2]",
+                                "OUTBOX", "JUMP A"]))
+        self.assertEqual([(1, 3, frozenset([0, 1, 2]), True), (4, 6, frozenset([0, 1, 2]), True)],
+                         hrsuper.find_regions(code))
+
+    def test_cancel_out(self):
+        code = ["INBOX", "COPYTO 0", "INBOX", "COPYTO 1", "COPYFROM 0", "SUB 1", "COPYTO 2", "COPYFROM 1", "ADD 2",
+                "OUTBOX"]
+        self.assertEqual(["INBOX", "COPYTO 0", "INBOX", "COPYFROM 0", "OUTBOX"], superoptimize(code))
+
+    def test_shorter_multiplication(self):
+        code = ["INBOX", "COPYTO 0", "COPYTO 1", "ADD 1", "COPYTO 1", "ADD 1", "COPYTO 2", "ADD 0", "OUTBOX",
+                "COPYFROM 2", "OUTBOX"]
+        self.assertEqual(["INBOX", "COPYTO 0", "ADD 0", "COPYTO 1", "ADD 1", "COPYTO 2", "ADD 0", "OUTBOX",
+                          "COPYFROM 2", "OUTBOX"], superoptimize(code))
+
+    def test_keep_live_tiles(self):
+        # Tile 1 is read by the second output, so b can not be bumped in place of a
+        code = ["INBOX", "COPYTO 0", "COPYTO 1", "BUMPUP 1", "OUTBOX", "COPYFROM 0", "OUTBOX"]
+        self.assertEqual(code, superoptimize(code))
+
+    def test_keep_optimal_code(self):
+        with open(os.path.join(hrc_bench.EXAMPLES_DIR, "level20.hc")) as f:
+            code = hrc.getCompiler().compileIR(hrc.parse(f.read()), True)
+        self.assertEqual(code, hrsuper.superoptimize(code, 10, 1))
+
+    def test_execute(self):
+        self.assertEqual((3, (3, 3)), hrsuper.execute((hrir.COPYTO, 1), (3, (3, None))))
+        self.assertEqual((1, ("C", "B")), hrsuper.execute((hrir.SUB, 1), ("C", ("C", "B"))))
+        self.assertEqual(None, hrsuper.execute((hrir.ADD, 1), ("C", ("C", "B"))))
+        self.assertEqual(None, hrsuper.execute((hrir.BUMPUP, 0), (None, (999,))))
+        self.assertEqual(None, hrsuper.execute((hrir.COPYFROM, 0), (1, (None,))))
+
+
+if __name__ == '__main__':
+    unittest.main()